@@ -1,5 +1,5 @@
 const mongoose = require('mongoose');
-const { OPCUAClient, MessageSecurityMode, SecurityPolicy, AttributeIds, resolveNodeId, makeBrowsePath, BrowseDirection } = require('node-opcua');
+const { OPCUAClient, MessageSecurityMode, SecurityPolicy, AttributeIds, DataType, resolveNodeId, makeBrowsePath, BrowseDirection } = require('node-opcua');
 const path = require('path');
 const os = require('os');
 
@@ -18,7 +18,18 @@ class OPCUAGateway {
         this.dataLoggingInterval = null;
         this.discoveredNodes = {};
         this.tcpClient = null;
+        this.tcpReconnectTimer = null;
         this.allFoundNodes = [];
+        this.isDisconnecting = false;
+
+        // Nachliefern aus der Outbox des Raspberry Pi: zuletzt gespeicherte Sequenznummer
+        // und Epoche der Outbox (ändert sich, wenn die Outbox neu angelegt wird)
+        this.lastSeq = null;
+        this.outboxEpoch = null;
+        this.sensorsObjectId = null;
+        this.backlogMethodId = null;
+        this.isSyncing = false;
+        this.savedSamples = Promise.resolve();
 
         this.nodeIds = {
             temperature: null,
@@ -31,6 +42,9 @@ class OPCUAGateway {
 
     async connectToServer() {
         console.log('🔌 Verbinde zu OPC UA Server:', this.endpointUrl);
+        // Nach einem disconnect() darf der TCP-Fallback wieder neu verbinden
+        this.isDisconnecting = false;
+        await this.loadLastSeq();
 
         try {
             console.log('🔒 Verwende SignAndEncrypt Basic256Sha256...');
@@ -79,6 +93,12 @@ class OPCUAGateway {
         }
 
         try {
+            // 0. Feste NodeIds aus dem Manifest des Servers lesen (ein einziger Read)
+            if (await this.readNodeManifest()) {
+                this.printNodeSummary();
+                return;
+            }
+
             console.log('🔍 Starte vollständige Node-Entdeckung...');
             this.allFoundNodes = [];
 
@@ -102,6 +122,36 @@ class OPCUAGateway {
         }
     }
 
+    async readNodeManifest() {
+        try {
+            const dataValue = await this.session.read({
+                nodeId: 'ns=2;s=Sensors.Manifest',
+                attributeId: AttributeIds.Value
+            });
+
+            if (!dataValue.statusCode.isGoodish() || typeof dataValue.value?.value !== 'string') {
+                console.log('⚠️ Kein Node-Manifest auf dem Server gefunden');
+                return false;
+            }
+
+            const manifest = JSON.parse(dataValue.value.value);
+            const variables = manifest.variables || {};
+            this.nodeIds.temperature = variables.Temperature?.nodeId || null;
+            this.nodeIds.humidity = variables.Humidity?.nodeId || null;
+            this.nodeIds.color = variables.Color?.nodeId || null;
+            this.nodeIds.fanStatus = variables.FanStatus?.nodeId || null;
+
+            this.sensorsObjectId = manifest.objectId || null;
+            this.backlogMethodId = manifest.methods?.GetBacklog?.nodeId || null;
+
+            console.log('📋 Node-Manifest gelesen, Browse wird übersprungen');
+            return true;
+        } catch (error) {
+            console.log('⚠️ Node-Manifest konnte nicht gelesen werden:', error.message);
+            return false;
+        }
+    }
+
     async browseRecursively(nodeId, currentDepth, maxDepth) {
         if (currentDepth >= maxDepth) return;
 
@@ -332,30 +382,58 @@ class OPCUAGateway {
         this.tcpClient = new net.Socket();
 
         const HOST = '10.62.255.1';
-        const PORT = 5555; // Anderer Port für Sensordaten
+        const PORT = 5000; // TCP-Server des Raspberry Pi, eine JSON-Zeile pro Datensatz
+
+        let buffer = '';
 
         this.tcpClient.connect(PORT, HOST, () => {
             console.log(`✅ TCP-Fallback verbunden (${HOST}:${PORT})`);
+            // Mit bekannter Sequenznummer liefert der Pi alle verpassten Datensätze nach,
+            // bei geänderter Epoche von vorne
+            const epoch = this.outboxEpoch ? ` ${this.outboxEpoch}` : '';
+            this.tcpClient.write(this.lastSeq !== null ? `JSON RESUME ${this.lastSeq}${epoch}\n` : 'JSON\n');
         });
 
         this.tcpClient.on('data', (data) => {
-            try {
-                const sensorData = JSON.parse(data.toString());
-                console.log('📊 TCP Sensordaten empfangen:', sensorData);
+            buffer += data.toString();
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            const samples = [];
 
-                if (sensorData.temperature !== undefined) {
-                    this.nodeIds.temperature = 'tcp:temperature';
-                }
-                if (sensorData.humidity !== undefined) {
-                    this.nodeIds.humidity = 'tcp:humidity';
-                }
-                if (sensorData.color !== undefined) {
-                    this.nodeIds.color = 'tcp:color';
+            for (const line of lines) {
+                if (!line.trim()) continue;
+
+                try {
+                    const sensorData = JSON.parse(line);
+
+                    // Kopfzeile vor dem Rückstand: aktuelle Epoche der Outbox
+                    if (sensorData.epoch !== undefined) {
+                        this.setOutboxEpoch(sensorData.epoch);
+                        continue;
+                    }
+
+                    if (sensorData.temperature !== undefined) {
+                        this.nodeIds.temperature = 'tcp:temperature';
+                    }
+                    if (sensorData.humidity !== undefined) {
+                        this.nodeIds.humidity = 'tcp:humidity';
+                    }
+                    if (sensorData.color !== undefined) {
+                        this.nodeIds.color = 'tcp:color';
+                    }
+
+                    samples.push(sensorData);
+                } catch (error) {
+                    console.log('❌ TCP Daten-Parse Fehler:', error.message);
                 }
+            }
 
-                this.saveSensorData(sensorData.temperature, sensorData.humidity, sensorData.color);
-            } catch (error) {
-                console.log('❌ TCP Daten-Parse Fehler:', error.message);
+            // Nacheinander speichern, damit lastSeq nur nach erfolgreichem Speichern weiterläuft
+            if (samples.length > 0) {
+                const epoch = this.outboxEpoch;
+                this.savedSamples = this.savedSamples
+                    .then(() => this.saveSamples(samples, epoch))
+                    .catch(() => this.tcpClient.destroy()); // Neu verbinden und ab lastSeq fortsetzen
             }
         });
 
@@ -365,15 +443,113 @@ class OPCUAGateway {
 
         this.tcpClient.on('close', () => {
             console.log('🔌 TCP-Fallback Verbindung geschlossen');
+
+            // Nach einem Abbruch neu verbinden und ab lastSeq fortsetzen
+            if (!this.isDisconnecting) {
+                this.tcpReconnectTimer = setTimeout(() => this.setupTCPFallback(), 5000);
+            }
         });
     }
 
+    async loadLastSeq() {
+        try {
+            // Zuletzt eingefügter Datensatz, nicht die höchste Sequenznummer: nach einem
+            // Neuanlegen der Outbox liegen ältere Datensätze mit höheren Nummern vor
+            const latest = await SensorModel.findOne({ seq: { $ne: null } }).sort({ _id: -1 });
+            this.lastSeq = latest ? latest.seq : null;
+            this.outboxEpoch = latest && latest.epoch ? latest.epoch : null;
+            console.log(`🔢 Letzte gespeicherte Sequenznummer: ${this.lastSeq ?? 'keine'} (Epoche ${this.outboxEpoch ?? 'unbekannt'})`);
+        } catch (error) {
+            console.log('⚠️ Letzte Sequenznummer konnte nicht gelesen werden:', error.message);
+        }
+    }
+
+    // Gibt true zurück, wenn die Outbox neu angelegt wurde und lastSeq verworfen ist
+    setOutboxEpoch(epoch) {
+        const changed = this.outboxEpoch !== null && epoch !== this.outboxEpoch;
+        if (changed) {
+            // Die Sequenz beginnt wieder bei 1
+            console.log(`🔄 Neue Outbox-Epoche ${epoch}, Nachliefern beginnt von vorne`);
+            this.lastSeq = null;
+        }
+        this.outboxEpoch = epoch;
+        return changed;
+    }
+
     async startDataLogging() {
         console.log('📊 Starte Datenprotokollierung...');
 
-        this.dataLoggingInterval = setInterval(async () => {
-            await this.readAndSaveSensorData();
-        }, 5000); // Alle 5 Sekunden
+        // Mit GetBacklog werden alle Messwerte aus der Outbox abgeholt, sonst nur der aktuelle Stand
+        const logData = this.backlogMethodId
+            ? () => this.syncBacklog()
+            : () => this.readAndSaveSensorData();
+
+        await logData();
+        this.dataLoggingInterval = setInterval(logData, 5000); // Alle 5 Sekunden
+    }
+
+    async syncBacklog() {
+        if (this.isSyncing || !this.session || !this.isConnected) {
+            return;
+        }
+
+        this.isSyncing = true;
+        try {
+            // Blockweise abholen, bis der Rückstand (z.B. nach einem Verbindungsabbruch) aufgeholt ist
+            while (true) {
+                const result = await this.session.call({
+                    objectId: this.sensorsObjectId,
+                    methodId: this.backlogMethodId,
+                    inputArguments: [
+                        { dataType: DataType.UInt32, value: this.lastSeq ?? 0 },
+                        { dataType: DataType.UInt32, value: 0 }
+                    ]
+                });
+
+                if (!result.statusCode.isGood()) {
+                    console.log('⚠️ GetBacklog fehlgeschlagen:', result.statusCode.toString());
+                    return;
+                }
+
+                const backlog = JSON.parse(result.outputArguments[0].value);
+                if (backlog.epoch && this.setOutboxEpoch(backlog.epoch)) {
+                    continue; // Ab Sequenz 0 erneut abholen
+                }
+                if (backlog.samples.length === 0) {
+                    return;
+                }
+                await this.saveSamples(backlog.samples, this.outboxEpoch);
+            }
+        } catch (error) {
+            console.error('❌ Fehler beim Abholen der Outbox:', error.message);
+        } finally {
+            this.isSyncing = false;
+        }
+    }
+
+    async saveSamples(samples, epoch = null) {
+        try {
+            const documents = samples.map(sample => ({
+                seq: sample.seq,
+                epoch: epoch,
+                temperature: sample.temperature,
+                humidity: sample.humidity,
+                color: sample.color,
+                timestamp: new Date(sample.timestamp * 1000)
+            }));
+
+            await SensorModel.insertMany(documents);
+            this.lastSeq = samples[samples.length - 1].seq;
+
+            if (samples.length > 1) {
+                console.log(`💾 ${samples.length} Sensordaten nachgeliefert (bis Sequenz ${this.lastSeq})`);
+            } else {
+                console.log('💾 Sensordaten gespeichert:', documents[0]);
+            }
+        } catch (error) {
+            console.error('❌ Fehler beim Speichern der Sensordaten:', error.message);
+            throw error;
+        }
     }
 
     async readAndSaveSensorData() {
@@ -486,6 +662,12 @@ class OPCUAGateway {
 
     async disconnect() {
         console.log('🔌 Trenne OPC UA Verbindung...');
+        this.isDisconnecting = true;
+
+        if (this.tcpReconnectTimer) {
+            clearTimeout(this.tcpReconnectTimer);
+            this.tcpReconnectTimer = null;
+        }
 
         if (this.dataLoggingInterval) {
             clearInterval(this.dataLoggingInterval);
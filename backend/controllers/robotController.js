@@ -1,52 +1,77 @@
-const { exec } = require('child_process');
 const partsController = require('../controllers/partsController');
 const partsModel = require('../models/partsModel');
+const robotWorker = require('../services/robotWorker');
 
-exports.startRoutine = async (req, res) => {
-    exec('py ./scripts/pick_and_place.py', async (err, stdout, stderr) => {
-        if (err) {
-            console.log(stderr);
-            return res.status(500).json({ message: "Steuerung fehlgeschlagen." });
-        }
+async function createPart(color) {
+    const latestPart = await partsModel.findOne().sort({ partNumber: -1 });
+    let nextNumber = 1;
 
-        const match = stdout.match(/RESULT:(\w+)/);
-        if (!match) {
-            return res.status(500).json({ message: "Keine Farbe erkannt." });
-        }
+    if (latestPart && latestPart.partNumber) {
+        const match = latestPart.partNumber.match(/B-(\d+)/);
+        if (match) nextNumber = parseInt(match[1]) + 1;
+    }
+
+    const partNumber = `B-${String(nextNumber).padStart(3, '0')}`;
 
-        const colors = stdout
-            .split('\n')
-            .filter(line => line.startsWith('RESULT:'))
-            .map(line => line.split(':')[1]);
+    const fakeReq = {
+        body: {
+            partNumber,
+            color: color,
+            timestamp: new Date(),
+            energyUsage: 0.2
+        }
+    };
 
-        for (const color of colors) {
-            const latestPart = await partsModel.findOne().sort({ partNumber: -1 });
-            let nextNumber = 1;
+    const fakeRes = {
+        status: () => ({ json: () => { } }),
+        json: () => { }
+    };
 
-            if (latestPart && latestPart.partNumber) {
-                const match = latestPart.partNumber.match(/B-(\d+)/);
-                if (match) nextNumber = parseInt(match[1]) + 1;
-            }
+    await partsController.createNewPart(fakeReq, fakeRes);
+}
 
-            const partNumber = `B-${String(nextNumber).padStart(3, '0')}`;
+exports.startRoutine = async (req, res) => {
+    // Teile werden gespeichert, sobald der Roboter sie meldet - nacheinander,
+    // damit die Teilenummern fortlaufend bleiben. Schlägt ein Teil fehl, werden
+    // die folgenden trotzdem gespeichert.
+    const savedParts = [];
+    let previous = Promise.resolve();
 
-            const fakeReq = {
-                body: {
-                    partNumber,
-                    color: color,
-                    timestamp: new Date(),
-                    energyUsage: 0.2
-                }
-            };
+    const saveAll = async () => {
+        const results = await Promise.allSettled(savedParts.map(part => part.saved));
+        const failedParts = [];
+        results.forEach((outcome, i) => {
+            if (outcome.status === 'rejected') {
+                console.log(`Teil ${i + 1} (${savedParts[i].color}) konnte nicht gespeichert werden: ${outcome.reason.message}`);
+                failedParts.push({ index: i + 1, color: savedParts[i].color, error: outcome.reason.message });
+            }
+        });
+        return failedParts;
+    };
 
-            const fakeRes = {
-                status: () => ({ json: () => { } }),
-                json: () => { }
-            };
+    try {
+        const result = await robotWorker.runJob((color) => {
+            const saved = previous.then(() => createPart(color));
+            previous = saved.catch(() => { });
+            savedParts.push({ color, saved });
+        });
+        const failedParts = await saveAll();
 
-            await partsController.createNewPart(fakeReq, fakeRes);
+        if (result.count === 0) {
+            return res.status(500).json({ message: "Keine Farbe erkannt." });
         }
 
-        res.status(200).json({ message: "Steuerung erfolgreich." });
-    });
+        res.status(200).json({
+            message: failedParts.length === 0
+                ? "Steuerung erfolgreich."
+                : `Steuerung erfolgreich, ${failedParts.length} Teil(e) nicht gespeichert.`,
+            parts: result.count,
+            duration: result.duration,
+            failedParts
+        });
+    } catch (error) {
+        console.log(error.message);
+        await saveAll();
+        return res.status(500).json({ message: "Steuerung fehlgeschlagen." });
+    }
 };
@@ -14,6 +14,7 @@ const partsRoutes = require('./routes/partsRoutes');
 const robotRoutes = require('./routes/robotRoutes')
 const authRoutes = require('./routes/authRoutes')
 const temperatureRoutes = require(`./routes/temperatureRoutes`)
+const robotWorker = require('./services/robotWorker');
 
 mongoose.connect(process.env.MONGO_DB_URL, {
 }).then(response => {
@@ -161,3 +162,12 @@ try {
         console.log('⚠️  HTTP Server läuft auf Port: ' + HTTP_PORT);
     });
 }
+
+// Robot-Worker beim Beenden sauber herunterfahren (Saugnapf aus, Kamera frei)
+for (const signal of ['SIGINT', 'SIGTERM']) {
+    process.once(signal, async () => {
+        console.log(`${signal} empfangen - beende Robot-Worker...`);
+        await robotWorker.stop();
+        process.exit(0);
+    });
+}
@@ -1,5 +1,7 @@
 const mongoose = require('mongoose');
 module.exports = mongoose.model('sensor', {
+  seq: Number,
+  epoch: String,
   temperature: Number,
   humidity: Number,
   timestamp: Date
@@ -0,0 +1,159 @@
+"""
+Zusammenfassen der Block-Erkennungen aus mehreren Frames
+
+Jede Erkennung wird über ein Gitter (Zellgröße = Suchradius) pro Farbe dem
+nächsten Cluster zugeordnet. Dadurch müssen nur die 3×3 Nachbarzellen
+durchsucht werden statt aller bisherigen Gruppen. Mittelwert und Varianz
+werden mit dem Welford-Verfahren fortlaufend aktualisiert, ein zweiter
+Durchlauf über alle Erkennungen entfällt.
+"""
+import math
+
+# Maximaler Abstand (pro Achse) einer Erkennung zum Mittelpunkt ihres Clusters
+CLUSTER_RADIUS = 50
+
+# Mindestanzahl an Messungen für einen stabilen Block
+MIN_MEASUREMENTS = 3
+
+
+class BlockCluster:
+    """Ein erkannter Block mit fortlaufend berechnetem Mittelwert und Varianz"""
+
+    __slots__ = ("cluster_id", "color", "count", "mean_x", "mean_y", "m2_x", "m2_y", "area_sum", "cell")
+
+    def __init__(self, cluster_id, color):
+        self.cluster_id = cluster_id
+        self.color = color
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.area_sum = 0.0
+        self.cell = None
+
+    def add(self, x, y, area):
+        """Fügt eine Messung hinzu (Welford)"""
+        self.count += 1
+        delta_x = x - self.mean_x
+        delta_y = y - self.mean_y
+        self.mean_x += delta_x / self.count
+        self.mean_y += delta_y / self.count
+        self.m2_x += delta_x * (x - self.mean_x)
+        self.m2_y += delta_y * (y - self.mean_y)
+        self.area_sum += area
+
+    @property
+    def stability_x(self):
+        """Standardabweichung in X (Pixel)"""
+        return math.sqrt(self.m2_x / self.count) if self.count > 1 else 0.0
+
+    @property
+    def stability_y(self):
+        """Standardabweichung in Y (Pixel)"""
+        return math.sqrt(self.m2_y / self.count) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {
+            'color': self.color,
+            'pixel_x': self.mean_x,
+            'pixel_y': self.mean_y,
+            'area': self.area_sum / self.count,
+            'measurements': self.count,
+            'stability_x': self.stability_x,
+            'stability_y': self.stability_y
+        }
+
+
+class BlockClusterer:
+    """
+    Ordnet Erkennungen fortlaufend Clustern zu.
+    Eine Erkennung gehört zum nächsten Cluster gleicher Farbe, dessen Mittelpunkt
+    in X und Y weniger als `radius` Pixel entfernt ist, sonst entsteht ein neuer.
+    """
+
+    def __init__(self, radius=CLUSTER_RADIUS):
+        self.radius = radius
+        self.clusters = []
+        self._grid = {}  # (Farbe, Zelle X, Zelle Y) -> Liste von Clustern
+
+    def _cell(self, x, y):
+        return math.floor(x / self.radius), math.floor(y / self.radius)
+
+    def _find_nearest(self, color, x, y):
+        cell_x, cell_y = self._cell(x, y)
+        nearest = None
+        nearest_distance = None
+
+        for offset_x in (-1, 0, 1):
+            for offset_y in (-1, 0, 1):
+                for cluster in self._grid.get((color, cell_x + offset_x, cell_y + offset_y), ()):
+                    distance = max(abs(cluster.mean_x - x), abs(cluster.mean_y - y))
+                    if distance >= self.radius:
+                        continue
+                    if (nearest is None or distance < nearest_distance or
+                            (distance == nearest_distance and cluster.cluster_id < nearest.cluster_id)):
+                        nearest = cluster
+                        nearest_distance = distance
+
+        return nearest
+
+    def _move_to_cell(self, cluster):
+        cell = (cluster.color, *self._cell(cluster.mean_x, cluster.mean_y))
+        if cell == cluster.cell:
+            return
+        if cluster.cell is not None:
+            self._grid[cluster.cell].remove(cluster)
+        self._grid.setdefault(cell, []).append(cluster)
+        cluster.cell = cell
+
+    def add(self, detection):
+        """Fügt eine Erkennung ({'color', 'pixel_x', 'pixel_y', 'area'}) hinzu"""
+        color = detection['color']
+        x = detection['pixel_x']
+        y = detection['pixel_y']
+
+        cluster = self._find_nearest(color, x, y)
+        if cluster is None:
+            cluster = BlockCluster(len(self.clusters), color)
+            self.clusters.append(cluster)
+
+        cluster.add(x, y, detection.get('area', 0.0))
+        self._move_to_cell(cluster)
+        return cluster
+
+    def add_many(self, detections):
+        for detection in detections:
+            self.add(detection)
+
+    def is_stable(self, frames, max_deviation, min_measurements=MIN_MEASUREMENTS):
+        """
+        Prüft, ob alle Blöcke genügend Messungen und eine Standardabweichung
+        unter `max_deviation` Pixeln haben. Cluster, die in weniger als der Hälfte
+        der `frames` gesehen wurden, gelten als Störung und werden ignoriert.
+        """
+        if frames < min_measurements:
+            return False
+
+        for cluster in self.clusters:
+            if cluster.count * 2 < frames:
+                continue
+            if (cluster.count < min_measurements or
+                    cluster.stability_x >= max_deviation or cluster.stability_y >= max_deviation):
+                return False
+        return True
+
+    def get_blocks(self, min_measurements=MIN_MEASUREMENTS):
+        """Gibt alle Cluster mit genügend Messungen als Block-Dictionaries zurück"""
+        return [cluster.to_dict() for cluster in self.clusters if cluster.count >= min_measurements]
+
+
+def cluster_detections(detections, radius=CLUSTER_RADIUS, min_measurements=MIN_MEASUREMENTS):
+    """
+    Fasst alle Erkennungen zu Blöcken zusammen.
+    Die Erkennungen werden vorher sortiert, damit das Ergebnis nicht von ihrer
+    Reihenfolge abhängt.
+    """
+    clusterer = BlockClusterer(radius)
+    clusterer.add_many(sorted(detections, key=lambda d: (d['color'], d['pixel_x'], d['pixel_y'])))
+    return clusterer.get_blocks(min_measurements)
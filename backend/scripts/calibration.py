@@ -0,0 +1,160 @@
+"""
+Kalibrierung Kamera-Pixel → Roboter-Koordinaten
+
+Aus mindestens 4 Referenzpunkten (Pixelposition im Scan-Bild und die dazu
+angefahrene Roboterposition) wird eine Homographie berechnet, optional nach
+einer Entzerrung der Linse. Das Ergebnis wird versioniert als JSON gespeichert
+und beim Start geladen.
+
+Format der Referenzpunkte:
+
+    {
+        "points": [{"pixel": [412.5, 233.0], "robot": [38.2, -187.5]}, ...],
+        "camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]],   (optional)
+        "dist_coeffs": [k1, k2, p1, p2, k3]                       (optional)
+    }
+
+    python calibration.py referenzpunkte.json -o calibration.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+CALIBRATION_VERSION = 1
+DEFAULT_CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibration.json')
+
+# Maximaler Reprojektionsfehler (mm) für RANSAC
+RANSAC_THRESHOLD = 3.0
+
+
+class Calibration:
+    """Rechnet Pixelpositionen mit einer Homographie in Roboter-Koordinaten um"""
+
+    def __init__(self, homography, camera_matrix=None, dist_coeffs=None, rms_error=None,
+                 source='legacy', created=None):
+        self.homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.camera_matrix = None if camera_matrix is None else np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = None if dist_coeffs is None else np.asarray(dist_coeffs, dtype=np.float64)
+        self.rms_error = rms_error
+        self.source = source
+        self.created = created
+
+    @classmethod
+    def from_scale(cls, pixel_to_mm_x, pixel_to_mm_y, origin, center=(320, 240)):
+        """Bisherige Umrechnung (Skalierung um die Bildmitte) als Homographie"""
+        homography = [[pixel_to_mm_x, 0, origin[0] - pixel_to_mm_x * center[0]],
+                      [0, pixel_to_mm_y, origin[1] - pixel_to_mm_y * center[1]],
+                      [0, 0, 1]]
+        return cls(homography, source='legacy')
+
+    @classmethod
+    def solve(cls, pixel_points, robot_points, camera_matrix=None, dist_coeffs=None):
+        """Berechnet die Homographie aus Referenzpunkten"""
+        pixel_points = np.asarray(pixel_points, dtype=np.float64).reshape(-1, 2)
+        robot_points = np.asarray(robot_points, dtype=np.float64).reshape(-1, 2)
+        if len(pixel_points) < 4 or len(pixel_points) != len(robot_points):
+            raise ValueError("Mindestens 4 Paare aus Pixel- und Roboterposition nötig")
+
+        calibration = cls(np.eye(3), camera_matrix, dist_coeffs, source='file', created=time.time())
+        undistorted = calibration.undistort(pixel_points)
+
+        method = cv2.RANSAC if len(pixel_points) > 4 else 0
+        homography, _ = cv2.findHomography(undistorted, robot_points, method, RANSAC_THRESHOLD)
+        if homography is None:
+            raise ValueError("Homographie konnte nicht berechnet werden (Punkte kollinear?)")
+
+        calibration.homography = homography
+        errors = np.linalg.norm(calibration.pixel_to_robot(pixel_points) - robot_points, axis=1)
+        calibration.rms_error = float(np.sqrt(np.mean(errors ** 2)))
+        return calibration
+
+    def undistort(self, pixel_points):
+        """Entzerrt Pixelpositionen (N×2), falls eine Kameramatrix vorhanden ist"""
+        points = np.asarray(pixel_points, dtype=np.float64).reshape(-1, 1, 2)
+        if self.camera_matrix is None:
+            return points.reshape(-1, 2)
+        return cv2.undistortPoints(points, self.camera_matrix, self.dist_coeffs,
+                                   P=self.camera_matrix).reshape(-1, 2)
+
+    def pixel_to_robot(self, pixel_points):
+        """Rechnet alle Pixelpositionen (N×2) in einem Schritt in Roboter-X/Y um"""
+        points = self.undistort(pixel_points)
+        if len(points) == 0:
+            return points
+        return cv2.perspectiveTransform(points.reshape(-1, 1, 2), self.homography).reshape(-1, 2)
+
+    def to_dict(self):
+        return {
+            'version': CALIBRATION_VERSION,
+            'created': self.created,
+            'rms_error': self.rms_error,
+            'homography': self.homography.tolist(),
+            'camera_matrix': None if self.camera_matrix is None else self.camera_matrix.tolist(),
+            'dist_coeffs': None if self.dist_coeffs is None else self.dist_coeffs.ravel().tolist()
+        }
+
+    def save(self, path=DEFAULT_CALIBRATION_FILE):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CALIBRATION_FILE):
+        with open(path) as f:
+            data = json.load(f)
+
+        if data.get('version') != CALIBRATION_VERSION:
+            raise ValueError(f"Kalibrierdatei hat Version {data.get('version')}, erwartet {CALIBRATION_VERSION}")
+
+        return cls(data['homography'], data.get('camera_matrix'), data.get('dist_coeffs'),
+                   data.get('rms_error'), source='file', created=data.get('created'))
+
+
+def load_calibration(path, fallback):
+    """
+    Lädt die Kalibrierdatei. Fehlt sie oder ist sie ungültig, wird `fallback`
+    (z.B. Calibration.from_scale) zurückgegeben.
+    """
+    if not os.path.exists(path):
+        print(f"[KALIBRIERUNG] Keine Kalibrierdatei gefunden ({path}) - verwende Standardwerte")
+        return fallback
+
+    try:
+        calibration = Calibration.load(path)
+        print(f"[KALIBRIERUNG] {path} geladen (Fehler: {calibration.rms_error or 0:.2f} mm)")
+        return calibration
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARNING] Kalibrierdatei ungültig: {e} - verwende Standardwerte")
+        return fallback
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Berechnet die Kamera-Kalibrierung aus Referenzpunkten")
+    parser.add_argument("points", help="JSON-Datei mit Referenzpunkten")
+    parser.add_argument("-o", "--output", default=DEFAULT_CALIBRATION_FILE, help="Zieldatei")
+    args = parser.parse_args()
+
+    with open(args.points) as f:
+        data = json.load(f)
+
+    pixel_points = [point['pixel'] for point in data['points']]
+    robot_points = [point['robot'] for point in data['points']]
+
+    try:
+        calibration = Calibration.solve(pixel_points, robot_points,
+                                        data.get('camera_matrix'), data.get('dist_coeffs'))
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    calibration.save(args.output)
+    print(f"[KALIBRIERUNG] {len(pixel_points)} Punkte, Fehler: {calibration.rms_error:.2f} mm → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
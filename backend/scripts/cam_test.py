@@ -4,18 +4,39 @@ import cv2
 import numpy as np
 import os
 
+from block_clustering import BlockClusterer
+from calibration import DEFAULT_CALIBRATION_FILE, Calibration, load_calibration
+from camera_session import CameraSession
+from color_segmentation import ColorSegmenter
+from motion_executor import MotionExecutor
+from motion_planner import estimate_unplanned_time, plan_picks
+
 # AlexGustafsson dobot-python library
 sys.path.insert(0, os.path.abspath('dobot-python/lib'))
 from interface import Interface
 
-print("[INFO] Verbindung zu Dobot wird hergestellt...")
-bot = Interface('COM8')
+ROBOT_PORT = 'COM8'
+
+bot = None
+# Befehle laufen über die Warteschlange des Dobot, gewartet wird auf deren Ausführung
+motion = None
 
-if bot.connected():
+def connect(port=ROBOT_PORT):
+    """Stellt die Verbindung zum Dobot her (einmal pro Prozess)"""
+    global bot, motion
+    if bot is not None:
+        return bot
+    
+    print("[INFO] Verbindung zu Dobot wird hergestellt...")
+    robot = Interface(port)
+    
+    if not robot.connected():
+        raise ConnectionError("Verbindung zum Dobot fehlgeschlagen!")
+    
     print("[INFO] Verbindung erfolgreich hergestellt!")
-else:
-    print("[ERROR] Verbindung fehlgeschlagen!")
-    exit()
+    bot = robot
+    motion = MotionExecutor(bot)
+    return bot
 
 # Positionen
 STANDARD_POS = [250, 0, 50, 0]
@@ -29,32 +50,52 @@ SORT_POSITIONS = {
     'yellow': [-72, 220, 7, 108]
 }
 
-# Kalibrierung
+# Kalibrierung - Standardwerte, falls keine Kalibrierdatei vorhanden ist
 PIXEL_TO_MM_X = 0.01
 PIXEL_TO_MM_Y = -2.2
+CALIBRATION_FILE = DEFAULT_CALIBRATION_FILE
+
+# Erstellen mit: python calibration.py referenzpunkte.json
+calibration = load_calibration(CALIBRATION_FILE, Calibration.from_scale(PIXEL_TO_MM_X, PIXEL_TO_MM_Y, SCAN_POS))
+
+# Wartezeiten
+SUCTION_TIME = 0.5  # Vakuum aufbauen, bevor der Block angehoben wird
+SCAN_SETTLE_TIME = 0.2  # Nachschwingen an der Scanposition abwarten
 
 # Multi-Sampling Parameter
 SAMPLING_COUNT = 8
-SAMPLING_DELAY = 0.2
 
-def set_suction(enable):
-    """Saugnapf ein/aus schalten"""
+# Adaptives Sampling: Abbruch, sobald alle Blöcke stabil sind
+SAMPLING_ADAPTIVE = True
+SAMPLING_STABILITY_PX = 1.5  # Maximale Standardabweichung pro Achse
+SAMPLING_MAX_FRAMES = 15
+SAMPLING_TIME_BUDGET = 2.0  # Sekunden
+
+# Kamera bleibt für alle Scans geöffnet
+CAMERA_INDEX = 1
+camera = CameraSession(CAMERA_INDEX, cv2.CAP_DSHOW)
+
+# Farbtabellen werden einmal aufgebaut und für alle Frames verwendet
+segmenter = ColorSegmenter()
+
+# Zuletzt angefahrene Position (Startpunkt für die Bewegungsplanung)
+current_position = list(STANDARD_POS)
+
+def set_suction(enable, wait=False):
+    """Saugnapf ein/aus schalten (wird nach den vorherigen Bewegungen ausgeführt)"""
     try:
-        # Set suction cup (enable_control, suction_on)
-        bot.set_end_effector_suction_cup(True, enable)
-        time.sleep(0.1)
+        motion.suction(enable, wait=wait)
     except Exception as e:
         print(f"[WARNING] Saugnapf-Steuerung fehlgeschlagen: {e}")
 
 def move_to_position(x, y, z, r, wait=True):
     """Bewegung zu Position - MOVJ (Joint Movement)"""
+    global current_position
     try:
-        # Mode 1 = MOVJ (Joint movement - keine linearen Zwischenschritte)
-        bot.set_point_to_point_command(1, x, y, z, r)
-        
-        if wait:
-            # Warte bis Bewegung abgeschlossen
-            time.sleep(2)  # Anpassen je nach Geschwindigkeit
+        # MOVJ (Joint movement - keine linearen Zwischenschritte)
+        # Mit wait=False wird der Befehl nur in die Warteschlange gestellt
+        motion.move(x, y, z, r, wait=wait)
+        current_position = [x, y, z, r]
             
     except Exception as e:
         print(f"[ERROR] Bewegung fehlgeschlagen: {e}")
@@ -63,8 +104,7 @@ def home_robot():
     """Roboter zur Home-Position fahren"""
     print("[HOME] Fahre zur Home-Position...")
     try:
-        bot.set_homing_command(0, wait=True)  # Auto homing
-        time.sleep(2)  # Warten bis Homing abgeschlossen
+        motion.home()  # Auto homing, wartet bis die Referenzfahrt abgeschlossen ist
     except Exception as e:
         print(f"[ERROR] Homing fehlgeschlagen: {e}")
 
@@ -74,165 +114,72 @@ def multi_sample_scan():
     
     # Direkt zur Scan-Position (kein Zwischenschritt nötig bei MOVJ)
     move_to_position(*SCAN_POS)
-    time.sleep(1)
+    time.sleep(SCAN_SETTLE_TIME)
     
-    print(f"[SCAN] Starte {SAMPLING_COUNT}x Sampling für höchste Genauigkeit...")
+    return sample_blocks()
+
+def sample_blocks():
+    """Nimmt Frames auf, bis die Blöcke stabil erkannt sind (ohne Roboterbewegung)"""
+    if SAMPLING_ADAPTIVE:
+        print(f"[SCAN] Starte adaptives Sampling (max. {SAMPLING_MAX_FRAMES} Frames / {SAMPLING_TIME_BUDGET}s)...")
+        max_frames = SAMPLING_MAX_FRAMES
+    else:
+        print(f"[SCAN] Starte {SAMPLING_COUNT}x Sampling für höchste Genauigkeit...")
+        max_frames = SAMPLING_COUNT
     
-    # Sammle alle Messungen
-    all_detections = []
+    # Die Kamera bleibt offen, die Bilder kommen direkt hintereinander.
+    # Die Statistik pro Block wird nach jedem Frame aktualisiert.
+    clusterer = BlockClusterer()
+    frames_used = 0
+    reason = "Frame-Budget"
+    start_time = time.monotonic()
     
-    for sample in range(SAMPLING_COUNT):
-        print(f"[SAMPLE] Messung {sample + 1}/{SAMPLING_COUNT}")
-        
-        cap = cv2.VideoCapture(1, cv2.CAP_DSHOW)
-        if not cap.isOpened():
-            continue
+    while frames_used < max_frames:
+        frame = camera.get_fresh_frame()
+        if frame is None:
+            reason = "keine Bilder"
+            break
         
-        # Mehrere Frames für bessere Qualität
-        for _ in range(3):
-            ret, frame = cap.read()
-        if not ret:
-            cap.release()
-            continue
+        frames_used += 1
+        print(f"[SAMPLE] Messung {frames_used}/{max_frames}")
         
         # Blöcke in diesem Frame finden
         frame_blocks = detect_blocks_in_frame(frame)
-        all_detections.extend(frame_blocks)
+        clusterer.add_many(sorted(frame_blocks, key=lambda d: (d['color'], d['pixel_x'], d['pixel_y'])))
         
-        cap.release()
-        time.sleep(SAMPLING_DELAY)
+        if SAMPLING_ADAPTIVE:
+            if clusterer.is_stable(frames_used, SAMPLING_STABILITY_PX):
+                reason = "stabil"
+                break
+            if time.monotonic() - start_time >= SAMPLING_TIME_BUDGET:
+                reason = "Zeit-Budget"
+                break
     
-    # Mittelwerte berechnen
-    averaged_blocks = calculate_averaged_positions(all_detections)
+    elapsed = time.monotonic() - start_time
     
-    print(f"[SCAN-RESULT] {len(averaged_blocks)} Blöcke mit {SAMPLING_COUNT}x Sampling erkannt")
+    # Mittelwerte in Roboter-Koordinaten
+    averaged_blocks = convert_to_robot_positions(clusterer.get_blocks())
+    
+    print(f"[SCAN-RESULT] {len(averaged_blocks)} Blöcke mit {frames_used} Frames in {elapsed:.2f}s erkannt (Ende: {reason})")
     
     return averaged_blocks
 
 def detect_blocks_in_frame(frame):
     """Erkennt Blöcke in einem einzelnen Frame"""
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    
-    color_ranges = {
-        'red': [(np.array([0, 120, 70]), np.array([10, 255, 255])), 
-                (np.array([170, 120, 70]), np.array([180, 255, 255]))],
-        'yellow': [(np.array([20, 100, 100]), np.array([30, 255, 255]))],
-        'green': [(np.array([40, 70, 70]), np.array([80, 255, 255]))],
-        'blue': [(np.array([100, 150, 20]), np.array([140, 255, 255]))]
-    }
-    
-    frame_blocks = []
-    
-    for color, ranges in color_ranges.items():
-        combined_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-        for lower, upper in ranges:
-            mask = cv2.inRange(hsv, lower, upper)
-            combined_mask = cv2.bitwise_or(combined_mask, mask)
-        
-        contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 300:
-                M = cv2.moments(contour)
-                if M["m00"] != 0:
-                    # Sub-Pixel Genauigkeit
-                    pixel_x = M["m10"] / M["m00"]
-                    pixel_y = M["m01"] / M["m00"]
-                    
-                    frame_blocks.append({
-                        'color': color,
-                        'pixel_x': pixel_x,
-                        'pixel_y': pixel_y,
-                        'area': area
-                    })
-    
-    return frame_blocks
+    return segmenter.detect(frame)
 
-def calculate_averaged_positions(all_detections):
-    """Berechnet Mittelwerte aller Messungen pro Block"""
-    if not all_detections:
-        return []
-    
-    # Gruppiere Detections nach Farbe und Position
-    block_groups = {}
+def convert_to_robot_positions(averaged_blocks):
+    """Rechnet die gemittelten Pixelpositionen in Roboter-Koordinaten um"""
+    # Alle Blöcke in einem Schritt umrechnen
+    pixels = np.array([[block['pixel_x'], block['pixel_y']] for block in averaged_blocks])
+    robot_positions = calibration.pixel_to_robot(pixels)
     
-    for detection in all_detections:
-        color = detection['color']
-        
-        # Finde ähnliche Blöcke (gleiche Farbe, ähnliche Position)
-        found_group = False
-        for group_id, group in block_groups.items():
-            if (group['color'] == color and 
-                abs(group['pixel_x_sum'] / group['count'] - detection['pixel_x']) < 50 and
-                abs(group['pixel_y_sum'] / group['count'] - detection['pixel_y']) < 50):
-                
-                # Zu existierender Gruppe hinzufügen
-                group['pixel_x_sum'] += detection['pixel_x']
-                group['pixel_y_sum'] += detection['pixel_y']
-                group['area_sum'] += detection['area']
-                group['count'] += 1
-                found_group = True
-                break
+    for block, (robot_x, robot_y) in zip(averaged_blocks, robot_positions):
+        block['x'] = float(robot_x)
+        block['y'] = float(robot_y)
         
-        if not found_group:
-            # Neue Gruppe erstellen
-            group_id = f"{color}_{len(block_groups)}"
-            block_groups[group_id] = {
-                'color': color,
-                'pixel_x_sum': detection['pixel_x'],
-                'pixel_y_sum': detection['pixel_y'],
-                'area_sum': detection['area'],
-                'count': 1
-            }
-    
-    # Mittelwerte berechnen und zu Roboter-Koordinaten konvertieren
-    averaged_blocks = []
-    
-    for group_id, group in block_groups.items():
-        if group['count'] >= 3:  # Mindestens 3 Messungen für Stabilität
-            
-            # Mittelwerte
-            avg_pixel_x = group['pixel_x_sum'] / group['count']
-            avg_pixel_y = group['pixel_y_sum'] / group['count']
-            
-            # Zu Roboter-Koordinaten
-            offset_x = (avg_pixel_x - 320) * PIXEL_TO_MM_X
-            offset_y = (avg_pixel_y - 240) * PIXEL_TO_MM_Y
-            
-            robot_x = SCAN_POS[0] + offset_x
-            robot_y = SCAN_POS[1] + offset_y
-            
-            # Stabilität berechnen
-            pixel_x_variance = 0
-            pixel_y_variance = 0
-            variance_count = 0
-            
-            for detection in all_detections:
-                if (detection['color'] == group['color'] and 
-                    abs(detection['pixel_x'] - avg_pixel_x) < 50 and
-                    abs(detection['pixel_y'] - avg_pixel_y) < 50):
-                    
-                    pixel_x_variance += (detection['pixel_x'] - avg_pixel_x) ** 2
-                    pixel_y_variance += (detection['pixel_y'] - avg_pixel_y) ** 2
-                    variance_count += 1
-            
-            stability_x = (pixel_x_variance / variance_count) ** 0.5 if variance_count > 1 else 0
-            stability_y = (pixel_y_variance / variance_count) ** 0.5 if variance_count > 1 else 0
-            
-            averaged_blocks.append({
-                'color': group['color'],
-                'x': robot_x,
-                'y': robot_y,
-                'pixel_x': avg_pixel_x,
-                'pixel_y': avg_pixel_y,
-                'measurements': group['count'],
-                'stability_x': stability_x,
-                'stability_y': stability_y
-            })
-            
-            print(f"[GEFUNDEN] {group['color']} bei Pixel({avg_pixel_x:.1f},{avg_pixel_y:.1f}) → Roboter({robot_x:.1f}, {robot_y:.1f})")
-            print(f"           📊 {group['count']} Messungen, Stabilität: X±{stability_x:.1f}px Y±{stability_y:.1f}px")
+        print(f"[GEFUNDEN] {block['color']} bei Pixel({block['pixel_x']:.1f},{block['pixel_y']:.1f}) → Roboter({block['x']:.1f}, {block['y']:.1f})")
+        print(f"           📊 {block['measurements']} Messungen, Stabilität: X±{block['stability_x']:.1f}px Y±{block['stability_y']:.1f}px")
     
     # Sortiere nach Stabilität (stabilste zuerst)
     averaged_blocks.sort(key=lambda x: x['stability_x'] + x['stability_y'])
@@ -251,7 +198,7 @@ def test_position(block):
 
 def adjust_calibration():
     """Passt X- und Y-Kalibrierung getrennt an"""
-    global PIXEL_TO_MM_X, PIXEL_TO_MM_Y
+    global PIXEL_TO_MM_X, PIXEL_TO_MM_Y, calibration
     
     print(f"Aktuelle Kalibrierung:")
     print(f"  X-Richtung: {PIXEL_TO_MM_X} mm/pixel")
@@ -266,50 +213,108 @@ def adjust_calibration():
         if new_y:
             PIXEL_TO_MM_Y = float(new_y)
         
+        calibration = Calibration.from_scale(PIXEL_TO_MM_X, PIXEL_TO_MM_Y, SCAN_POS)
         print(f"Neue Kalibrierung: X={PIXEL_TO_MM_X}, Y={PIXEL_TO_MM_Y}")
     except:
         print("Ungültige Eingabe - behalte alte Werte")
 
-def pick_and_place_block(block):
-    """Greift Block und sortiert ihn ein"""
+def print_throughput(count, elapsed):
+    """Gibt den Durchsatz in Teilen pro Stunde aus"""
+    parts_per_hour = count / elapsed * 3600 if elapsed > 0 else 0.0
+    print(f"[DURCHSATZ] {count} Teile in {elapsed:.1f}s = {parts_per_hour:.0f} Teile/h")
+
+def pick_and_place_block(block, on_result=None):
+    """Greift Block und sortiert ihn ein, der Arm bleibt an der Sortierposition"""
     print(f"[PICK] Greife {block['color']} bei ({block['x']:.1f}, {block['y']:.1f})")
     print(f"       Präzision: {block['measurements']} Messungen, Stabilität ±{block['stability_x']:.1f}px")
     
-    # Greifen - direkt zur Position (MOVJ)
-    move_to_position(block['x'], block['y'], -41, 0)
+    # Greifen - von oben über dem Block absenken, damit die Gelenkbewegung
+    # von der Ablage aus nicht über die anderen Blöcke streift
+    move_to_position(block['x'], block['y'], 50, 0, wait=False)
+    move_to_position(block['x'], block['y'], -41, 0, wait=False)
     set_suction(True)  # Saugnapf an
-    time.sleep(0.5)
+    motion.dwell(SUCTION_TIME)
     
-    # Block anheben
-    move_to_position(block['x'], block['y'], 50, 0)
+    # Block anheben - die folgenden Befehle laufen ohne Pause in der Warteschlange
+    move_to_position(block['x'], block['y'], 50, 0, wait=False)
     
     # Einsortieren - direkt zur Sortierposition (MOVJ)
     if block['color'] in SORT_POSITIONS:
         x, y, z, r = SORT_POSITIONS[block['color']]
-        move_to_position(x, y, z, r)
+        move_to_position(x, y, z, r, wait=False)
         set_suction(False)  # Saugnapf aus
-        move_to_position(*STANDARD_POS)
+        motion.wait()
         print(f"RESULT:{block['color']}")
+        if on_result:
+            on_result(block['color'])
     else:
-        set_suction(False)
+        set_suction(False, wait=True)
         print(f"[ERROR] Unbekannte Farbe: {block['color']}")
 
-def main():
-    """Hauptprogramm mit AlexGustafsson dobot-python"""
-    print("🎯 HOCHPRÄZISES PICK-AND-PLACE MIT JOINT-BEWEGUNGEN")
-    print(f"📊 {SAMPLING_COUNT}x Sampling für maximale Genauigkeit")
-    print("🔧 MOVJ-Modus: Keine linearen Zwischenschritte nötig")
+def process_blocks(blocks, on_result=None):
+    """Plant die Reihenfolge und arbeitet alle Blöcke ohne Zwischenstopp an der Standardposition ab"""
+    plan, skipped = plan_picks(blocks, current_position, SORT_POSITIONS)
+    for block in skipped:
+        print(f"[ERROR] Unbekannte Farbe: {block['color']} - Block wird übersprungen")
     
-    # Initial setup
+    estimated_total = sum(pick.estimated_time for pick in plan)
+    print(f"[PLAN] Reihenfolge: {' → '.join(pick.block['color'] for pick in plan)}")
+    print(f"[PLAN] Geschätzt {estimated_total:.1f}s (bisheriger Ablauf: {estimate_unplanned_time(blocks, STANDARD_POS, SORT_POSITIONS):.1f}s)")
+    
+    start_time = time.monotonic()
+    for i, pick in enumerate(plan, 1):
+        print(f"\n[PROGRESS] Block {i}/{len(plan)}")
+        block_start = time.monotonic()
+        pick_and_place_block(pick.block, on_result=on_result)
+        actual = time.monotonic() - block_start
+        print(f"[PLAN] {pick.block['color']}: {pick.travel:.0f}mm, geschätzt {pick.estimated_time:.1f}s, tatsächlich {actual:.1f}s")
+    
+    print(f"[PLAN] Gesamt: geschätzt {estimated_total:.1f}s, tatsächlich {time.monotonic() - start_time:.1f}s")
+
+def setup_robot():
+    """Saugnapf aus, Referenzfahrt und Standardposition"""
     print("[SETUP] Roboter-Initialisierung...")
     set_suction(False)  # Saugnapf aus
     
     home_robot()
     
-    time.sleep(1)
-    
     # Zur Standardposition
     move_to_position(*STANDARD_POS)
+
+def run_routine(on_result=None):
+    """
+    Ein Durchlauf ohne Rückfragen: scannen, planen und alle Blöcke einsortieren.
+    Setzt eine Kalibrierdatei voraus; gibt die Anzahl der einsortierten Blöcke zurück.
+    """
+    if calibration.source != 'file':
+        raise RuntimeError(f"Keine Kalibrierdatei ({CALIBRATION_FILE}) - bitte zuerst kalibrieren")
+    
+    start_time = time.monotonic()
+    blocks = multi_sample_scan()
+    count = 0
+    
+    def count_result(color):
+        nonlocal count
+        count += 1
+        if on_result:
+            on_result(color)
+    
+    if blocks:
+        process_blocks(blocks, on_result=count_result)
+    
+    move_to_position(*STANDARD_POS)
+    print_throughput(count, time.monotonic() - start_time)
+    return count
+
+def main():
+    """Hauptprogramm mit AlexGustafsson dobot-python"""
+    print("🎯 HOCHPRÄZISES PICK-AND-PLACE MIT JOINT-BEWEGUNGEN")
+    print(f"📊 {SAMPLING_COUNT}x Sampling für maximale Genauigkeit")
+    print("🔧 MOVJ-Modus: Keine linearen Zwischenschritte nötig")
+    
+    # Initial setup
+    connect()
+    setup_robot()
     
     while True:
         # Multi-Sampling Scan
@@ -319,29 +324,28 @@ def main():
             print("Keine stabilen Blöcke gefunden")
             break
         
-        # Stabilsten Block testen
-        most_stable_block = blocks[0]
-        print(f"Test-Block: {most_stable_block['color']} (stabilster Block)")
-        position_ok = test_position(most_stable_block)
-        
-        if not position_ok:
-            # Kalibrierung anpassen
-            adjust_calibration()
-            continue
+        # Ohne Kalibrierdatei: stabilsten Block testen und ggf. von Hand nachjustieren
+        if calibration.source != 'file':
+            most_stable_block = blocks[0]
+            print(f"Test-Block: {most_stable_block['color']} (stabilster Block)")
+            position_ok = test_position(most_stable_block)
+            
+            if not position_ok:
+                # Kalibrierung anpassen
+                adjust_calibration()
+                continue
         
         # Kalibrierung stimmt - alle Blöcke bearbeiten
         print(f"✅ Kalibrierung OK - bearbeite {len(blocks)} Blöcke")
         
-        for i, block in enumerate(blocks, 1):
-            print(f"\n[PROGRESS] Block {i}/{len(blocks)}")
-            pick_and_place_block(block)
+        process_blocks(blocks)
         
         break
     
     # Cleanup
     print("[CLEANUP] Roboter zur Standardposition...")
     move_to_position(*STANDARD_POS)
-    set_suction(False)
+    set_suction(False, wait=True)
     print("Fertig!")
 
 if __name__ == "__main__":
@@ -355,4 +359,7 @@ if __name__ == "__main__":
         print(f"[ERROR] Unerwarteter Fehler: {e}")
         set_suction(False)
     finally:
+        camera.close()
+        if motion:
+            motion.report()
         print("[INFO] Verbindung wird geschlossen...")
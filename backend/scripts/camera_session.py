@@ -0,0 +1,111 @@
+import threading
+import time
+
+import cv2
+
+
+class CameraSession:
+    """
+    Hält die Kamera über viele Aufnahmen hinweg geöffnet.
+    Ein Lese-Thread holt fortlaufend Bilder, get_fresh_frames() liefert nur
+    Bilder, die nach dem Aufruf aufgenommen wurden.
+    """
+
+    def __init__(self, index=1, api=cv2.CAP_DSHOW, warmup_frames=3):
+        self.index = index
+        self.api = api
+        self.warmup_frames = warmup_frames
+        self.cap = None
+
+        self._frame = None
+        self._frame_id = 0
+        self._frame_time = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_open(self):
+        return self.cap is not None and self._running
+
+    def open(self):
+        """Öffnet die Kamera und startet den Lese-Thread (mehrfacher Aufruf ist unschädlich)"""
+        if self.is_open():
+            return self
+
+        self.cap = cv2.VideoCapture(self.index, self.api)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            raise RuntimeError("Kamera konnte nicht geöffnet werden!")
+
+        # Die ersten Bilder nach dem Öffnen sind oft über- oder unterbelichtet
+        for _ in range(self.warmup_frames):
+            self.cap.read()
+
+        self._running = True
+        self._thread = threading.Thread(target=self._read_loop, name="CameraSession", daemon=True)
+        self._thread.start()
+        print(f"[KAMERA] Kamera {self.index} geöffnet")
+        return self
+
+    def _read_loop(self):
+        """Liest Bilder ohne Pause, damit immer das neueste Bild bereitliegt"""
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+
+            with self._condition:
+                self._frame = frame
+                self._frame_id += 1
+                self._frame_time = time.time()
+                self._condition.notify_all()
+
+    def get_fresh_frames(self, count=1, timeout=2.0):
+        """
+        Gibt bis zu `count` Bilder zurück, die nach dem Aufruf aufgenommen wurden.
+        Läuft das Timeout ab, werden nur die bis dahin erhaltenen Bilder zurückgegeben.
+        """
+        if not self.is_open():
+            self.open()
+
+        frames = []
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            last_id = self._frame_id
+            while len(frames) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if not self._condition.wait_for(lambda: self._frame_id > last_id, timeout=remaining):
+                    break
+                last_id = self._frame_id
+                frames.append(self._frame)
+
+        if len(frames) < count:
+            print(f"[WARNING] Nur {len(frames)}/{count} Bilder von der Kamera erhalten")
+        return frames
+
+    def get_fresh_frame(self, timeout=2.0):
+        """Gibt ein neues Bild zurück oder None"""
+        frames = self.get_fresh_frames(1, timeout)
+        return frames[0] if frames else None
+
+    def close(self):
+        """Beendet den Lese-Thread und gibt die Kamera frei"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+            print(f"[KAMERA] Kamera {self.index} geschlossen")
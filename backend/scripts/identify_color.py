@@ -1,66 +1,134 @@
+"""
+Farberkennung des gegriffenen Bauteils
+
+Der ColorClassifier wird einmal erzeugt und hält die Kamera offen. Pro Frame
+werden in einem Durchlauf alle Farben gezählt (Farbtabelle aus
+color_segmentation), die Entscheidung fällt per Mehrheitsentscheid über eine
+kurze Serie von Frames.
+
+Mit classify_during_move() wird schon abgestimmt, während der Arm das Bauteil
+noch zur Kamera fährt. Ohne Bauteil im Bild liefert jeder Frame "none" (darauf
+beruht auch das Ende der Sortierroutine); zeigen die letzten Frames einstimmig
+dieselbe Farbe, ist das Bauteil im Bild und die Farbe steht vor dem Stillstand fest.
+"""
+import time
+from collections import Counter, deque
+
 import cv2
 import numpy as np
 
-def identify():
-    lower_red1 = np.array([0, 120, 70])
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([170, 120, 70])
-    upper_red2 = np.array([180, 255, 255])
-    lower_yellow = np.array([20, 100, 100])
-    upper_yellow = np.array([30, 255, 255])
-    lower_green = np.array([40, 70, 70])
-    upper_green = np.array([80, 255, 255])
-    lower_blue = np.array([100, 150, 20])
-    upper_blue = np.array([140, 255, 255])
-    
-    cap = cv2.VideoCapture(1, cv2.CAP_DSHOW) 
-
-    if not cap.isOpened():
-        print("Kamera konnte nicht geöffnet werden!")
-        exit()
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Kein Bild von der Kamera empfangen!")
-            break
-
-        cv2.imshow("Kamera-Test", frame)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-        mask_red = cv2.bitwise_or(
-            cv2.inRange(hsv, lower_red1, upper_red1),
-            cv2.inRange(hsv, lower_red2, upper_red2)
-        )
-        mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
-        mask_green = cv2.inRange(hsv, lower_green, upper_green)
-        mask_blue = cv2.inRange(hsv, lower_blue, upper_blue)
-
-        if cv2.countNonZero(mask_red) > 200:
-            cap.release()
-            cv2.destroyAllWindows()
-            return "red"
-        elif cv2.countNonZero(mask_yellow) > 200:
-            cap.release()
-            cv2.destroyAllWindows()
-            return "yellow"
-        elif cv2.countNonZero(mask_green) > 200:
-            cap.release()
-            cv2.destroyAllWindows()
-            return "green"
-        elif cv2.countNonZero(mask_blue) > 200:
-            cap.release()
-            cv2.destroyAllWindows()
-            return "blue"
-        else:
-            cap.release()
-            cv2.destroyAllWindows()
-            return "none"
-
-    cap.release()
-    cv2.destroyAllWindows()
-    return None
+from camera_session import CameraSession
+from color_segmentation import ColorSegmenter
+
+CAMERA_INDEX = 1
+
+# Mindestanzahl Pixel einer Farbe, damit ein Frame für sie zählt
+MIN_PIXELS = 200
+
+# Frames pro Entscheidung; bei zu geringer Übereinstimmung wird eine weitere Serie aufgenommen
+VOTE_FRAMES = 5
+MIN_CONFIDENCE = 0.6
+
+# Längste Wartezeit auf die Ankunft an der Kamera bei der Erkennung während der Fahrt (Sekunden)
+ARRIVAL_TIMEOUT = 15.0
+
+
+class ColorClassifier:
+    """Erkennt die Farbe des Bauteils vor der Kamera per Mehrheitsentscheid"""
+
+    def __init__(self, camera=None, frames=VOTE_FRAMES, min_pixels=MIN_PIXELS, min_confidence=MIN_CONFIDENCE):
+        self.camera = camera or CameraSession(CAMERA_INDEX, cv2.CAP_DSHOW)
+        self.frames = frames
+        self.min_pixels = min_pixels
+        self.min_confidence = min_confidence
+        self.segmenter = ColorSegmenter()
+        self.colors = self.segmenter.colors
+
+    def score(self, frame):
+        """Gibt die Pixelanzahl jeder Farbe im Frame zurück"""
+        classes = self.segmenter.classify(frame)
+        counts = np.bincount(classes.ravel(), minlength=len(self.colors) + 1)[1:]
+        return dict(zip(self.colors, counts.tolist()))
+
+    def classify_frame(self, frame):
+        """Farbe mit den meisten Pixeln oder 'none', wenn keine Farbe genügend Pixel hat"""
+        scores = self.score(frame)
+        color = max(scores, key=scores.get)
+        return color if scores[color] >= self.min_pixels else "none"
+
+    def classify(self):
+        """
+        Nimmt eine Serie von Frames auf und stimmt über die Farbe ab.
+        :return: (Farbe, Konfidenz) - Konfidenz ist der Anteil der Frames mit dieser Farbe.
+        """
+        votes = Counter()
+        for _ in range(2):
+            frames = self.camera.get_fresh_frames(self.frames)
+            votes.update(self.classify_frame(frame) for frame in frames)
+
+            total = sum(votes.values())
+            if total == 0:
+                raise RuntimeError("Kein Bild von der Kamera empfangen!")
+
+            color, count = votes.most_common(1)[0]
+            confidence = count / total
+            if confidence >= self.min_confidence:
+                break
+
+        return color, confidence
+
+    def classify_during_move(self, arrived, timeout=ARRIVAL_TIMEOUT):
+        """
+        Stimmt während der Anfahrt ab, bis `arrived()` True liefert.
+        Zeigen die letzten `frames` Bilder einstimmig eine Farbe, wird sie sofort
+        zurückgegeben; sonst wird nach der Ankunft (spätestens nach `timeout`)
+        wie bisher mit classify() entschieden.
+        :return: (Farbe, Konfidenz, während der Fahrt erkannt)
+        """
+        recent = deque(maxlen=self.frames)
+        deadline = time.monotonic() + timeout
+        while not arrived() and time.monotonic() < deadline:
+            frame = self.camera.get_fresh_frame()
+            if frame is None:
+                break
+
+            recent.append(self.classify_frame(frame))
+            if len(recent) == self.frames and recent[0] != "none" and recent.count(recent[0]) == self.frames:
+                return recent[0], 1.0, True
+
+        color, confidence = self.classify()
+        return color, confidence, False
+
+    def close(self):
+        self.camera.close()
+
+
+_classifier = None
+
+
+def identify(arrived=None):
+    """
+    Erkennt die Farbe des Bauteils ('red', 'yellow', 'green', 'blue' oder 'none').
+    Mit `arrived` (liefert True, sobald der Arm an der Kamera steht) wird schon
+    während der Anfahrt erkannt.
+    """
+    global _classifier
+    if _classifier is None:
+        _classifier = ColorClassifier()
+
+    if arrived is None:
+        color, confidence = _classifier.classify()
+        print(f"[FARBE] {color} (Konfidenz {confidence:.0%})")
+        return color
+
+    color, confidence, during_move = _classifier.classify_during_move(arrived)
+    print(f"[FARBE] {color} (Konfidenz {confidence:.0%}{', während der Anfahrt' if during_move else ''})")
+    return color
+
+
+def close():
+    """Gibt die Kamera frei"""
+    global _classifier
+    if _classifier is not None:
+        _classifier.close()
+        _classifier = None
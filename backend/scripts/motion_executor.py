@@ -0,0 +1,138 @@
+"""
+Ausführung von Roboterbewegungen über die Befehlswarteschlange des Dobot
+
+Statt nach jedem Befehl eine feste Zeit zu warten, werden die Befehle in die
+Warteschlange des Dobot gestellt. Gewartet wird nur dort, wo das Programm
+wirklich auf das Ende der Bewegung angewiesen ist - bis der Dobot den Index des
+Befehls als ausgeführt meldet. Liefert der Dobot keinen Index, wird gewartet,
+bis die Position das Ziel erreicht hat und stillsteht.
+"""
+import math
+import time
+
+# Zeitlimits (Sekunden)
+MOVE_TIMEOUT = 10.0
+HOMING_TIMEOUT = 40.0
+POLL_INTERVAL = 0.02
+
+# Ziel gilt als erreicht, wenn die Position näher als POSE_TOLERANCE mm liegt
+POSE_TOLERANCE = 1.0
+
+# PTP-Modus 1 = MOVJ (Joint movement)
+PTP_MODE_MOVJ = 1
+
+
+def _queue_index(response):
+    """Liest den Warteschlangen-Index aus der Antwort eines Befehls"""
+    if isinstance(response, (list, tuple)):
+        response = response[0] if response else None
+    return int(response) if isinstance(response, (int, float)) else None
+
+
+class MotionExecutor:
+    """Stellt Befehle in die Warteschlange des Dobot und wartet auf ihre Ausführung"""
+
+    def __init__(self, bot, timeout=MOVE_TIMEOUT):
+        self.bot = bot
+        self.timeout = timeout
+        self.stats = {}  # Befehlsart -> [Anzahl, Gesamtzeit, Maximum]
+        self._pending = []  # (Index, Befehlsart, Zeitpunkt)
+        self._last_index = None
+        self._last_target = None
+
+    def _queue(self, kind, response, target=None):
+        index = _queue_index(response)
+        if index is not None:
+            self._pending.append((index, kind, time.monotonic()))
+            self._last_index = index
+        if target is not None:
+            self._last_target = target
+        return index
+
+    def _record(self, kind, seconds):
+        stats = self.stats.setdefault(kind, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+    def _complete_up_to(self, current_index):
+        now = time.monotonic()
+        still_pending = []
+        for index, kind, queued_at in self._pending:
+            if index <= current_index:
+                self._record(kind, now - queued_at)
+            else:
+                still_pending.append((index, kind, queued_at))
+        self._pending = still_pending
+
+    def move(self, x, y, z, r, wait=True, mode=PTP_MODE_MOVJ):
+        """Fährt zu einer Position; mit wait=False wird nur in die Warteschlange gestellt"""
+        index = self._queue('move', self.bot.set_point_to_point_command(mode, x, y, z, r), target=(x, y, z))
+        if wait:
+            self.wait(index)
+        return index
+
+    def suction(self, enable, wait=False):
+        """Schaltet den Saugnapf (in der Warteschlange nach den vorherigen Bewegungen)"""
+        index = self._queue('suction', self.bot.set_end_effector_suction_cup(True, enable))
+        if wait:
+            self.wait(index)
+        return index
+
+    def home(self, timeout=HOMING_TIMEOUT):
+        """Referenzfahrt - wartet immer auf das Ende"""
+        index = self._queue('home', self.bot.set_homing_command(0))
+        self._last_target = None
+        self.wait(index, timeout)
+        return index
+
+    def wait(self, index=None, timeout=None):
+        """
+        Wartet, bis der Befehl `index` (Standard: zuletzt gesendeter Befehl) ausgeführt ist.
+        :raises TimeoutError: wenn der Befehl nicht rechtzeitig fertig wird.
+        """
+        index = self._last_index if index is None else index
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        if index is None:
+            self._wait_for_pose(deadline)
+            return
+
+        while True:
+            current = _queue_index(self.bot.get_current_queue_index())
+            if current is not None and current >= index:
+                self._complete_up_to(current)
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Befehl {index} nach {timeout:.1f}s nicht ausgeführt (aktuell: {current})")
+            time.sleep(POLL_INTERVAL)
+
+    def _wait_for_pose(self, deadline):
+        """Wartet, bis die Position am Ziel liegt und sich nicht mehr ändert"""
+        if self._last_target is None:
+            return
+
+        started = time.monotonic()
+        previous = None
+        while True:
+            pose = self.bot.get_pose()[:3]
+            at_target = math.dist(pose, self._last_target) < POSE_TOLERANCE
+            settled = previous is not None and math.dist(pose, previous) < POSE_TOLERANCE / 10
+            if at_target and settled:
+                self._record('move', time.monotonic() - started)
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Zielposition {self._last_target} nicht erreicht (aktuell: {pose})")
+            previous = pose
+            time.sleep(POLL_INTERVAL)
+
+    def dwell(self, seconds):
+        """Wartet bis alle Befehle ausgeführt sind und dann `seconds` (z.B. für das Vakuum)"""
+        self.wait()
+        time.sleep(seconds)
+
+    def report(self):
+        """Gibt die gemessene Dauer pro Befehlsart aus"""
+        for kind, (count, total, maximum) in self.stats.items():
+            print(f"[MOTION] {kind:<8} {count:>4}x  Ø {total / count:.2f}s  max {maximum:.2f}s")
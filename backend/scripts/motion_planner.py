@@ -0,0 +1,79 @@
+"""
+Planung der Pick-and-Place-Reihenfolge
+
+Statt die Blöcke nach Stabilität abzuarbeiten und nach jedem Ablegen zur
+Standardposition zurückzufahren, wird die Reihenfolge nach dem
+Nächster-Nachbar-Verfahren gewählt: Von der aktuellen Position aus wird immer
+der Block genommen, bei dem der Weg zum Block plus der Weg vom Block zu seinem
+Ablageplatz am kürzesten ist. Nach dem Ablegen geht es direkt zum nächsten
+Block weiter. Angefahren wird jeder Block von oben (LIFT_Z), damit der
+Saugnapf bei der Gelenkbewegung von der Ablage nicht über die Blöcke streift.
+"""
+import math
+
+# Höhen für Greifen und Anheben (mm)
+PICK_Z = -41
+LIFT_Z = 50
+
+# Einfaches Zeitmodell für die Schätzung der Fahrzeit
+ROBOT_SPEED = 150.0  # mm/s (gemittelt über eine MOVJ-Bewegung)
+MOVE_OVERHEAD = 0.3  # s pro Bewegung (Beschleunigen/Abbremsen)
+SUCTION_TIME = 0.6  # s pro Greifen und Ablegen zusammen
+
+
+def distance(a, b):
+    """Abstand zweier Positionen [x, y, z, ...] in mm"""
+    return math.dist(a[:3], b[:3])
+
+
+def estimate_move_time(a, b):
+    """Geschätzte Dauer einer Bewegung von a nach b in Sekunden"""
+    return distance(a, b) / ROBOT_SPEED + MOVE_OVERHEAD
+
+
+class PlannedPick:
+    """Ein Block mit den geplanten Bewegungen und der geschätzten Dauer"""
+
+    def __init__(self, block, start, place):
+        self.block = block
+        self.approach = [block['x'], block['y'], LIFT_Z, 0]
+        self.pick = [block['x'], block['y'], PICK_Z, 0]
+        self.lift = [block['x'], block['y'], LIFT_Z, 0]
+        self.place = place
+
+        path = [start, self.approach, self.pick, self.lift, self.place]
+        self.travel = sum(distance(a, b) for a, b in zip(path, path[1:]))
+        self.estimated_time = sum(estimate_move_time(a, b) for a, b in zip(path, path[1:])) + SUCTION_TIME
+
+
+def plan_picks(blocks, start, sort_positions):
+    """
+    Legt die Reihenfolge der Blöcke fest.
+    :param blocks: Blöcke mit 'color', 'x' und 'y'.
+    :param start: Aktuelle Position des Roboters.
+    :param sort_positions: Ablageplatz pro Farbe.
+    :return: (Liste von PlannedPick, Blöcke ohne Ablageplatz)
+    """
+    remaining = [block for block in blocks if block['color'] in sort_positions]
+    skipped = [block for block in blocks if block['color'] not in sort_positions]
+
+    plan = []
+    current = start
+    while remaining:
+        candidates = [PlannedPick(block, current, sort_positions[block['color']]) for block in remaining]
+        best = min(range(len(candidates)), key=lambda i: candidates[i].travel)
+        plan.append(candidates[best])
+        current = candidates[best].place
+        del remaining[best]
+
+    return plan, skipped
+
+
+def estimate_unplanned_time(blocks, home, sort_positions):
+    """Geschätzte Dauer der bisherigen Abarbeitung (Rückkehr zu `home` nach jedem Block)"""
+    total = 0.0
+    for block in blocks:
+        if block['color'] in sort_positions:
+            pick = PlannedPick(block, home, sort_positions[block['color']])
+            total += pick.estimated_time + estimate_move_time(pick.place, home)
+    return total
@@ -1,35 +1,72 @@
-import time
+import math
 import sys
 from pydobot import Dobot
+import identify_color
 from identify_color import identify
 
 sys.path.insert(0, "src")
 
-print("[INFO] Verbindung zu Dobot wird hergestellt...")
-bot = Dobot("COM8")
-time.sleep(1)
-print("[INFO] Verbindung erfolgreich hergestellt!")
-bot.suck(False)
+ROBOT_PORT = "COM8"
+
+# Vakuum aufbauen, bevor das Bauteil angehoben wird
+SUCTION_TIME_MS = 300
+
+# Position vor der Kamera zur Farberkennung
+CAMERA_POS = (250, 0, 50, 0)
+# Der Arm gilt als angekommen, wenn er näher als CAMERA_POS_TOLERANCE mm an CAMERA_POS ist
+CAMERA_POS_TOLERANCE = 1.0
+
+bot = None
+
+def connect(port=ROBOT_PORT):
+    """Stellt die Verbindung zum Dobot her (einmal pro Prozess)"""
+    global bot
+    if bot is not None:
+        return bot
+    
+    print("[INFO] Verbindung zu Dobot wird hergestellt...")
+    bot = Dobot(port)
+    print("[INFO] Verbindung erfolgreich hergestellt!")
+    bot.suck(False)
+    return bot
 
 def pick():
     print("[AKTION] Greife nach Bauteil...")
-    bot.move_to(10, -241, -41, 0, wait=True)
-    bot.move_to(10, -241, -44, 0, wait=True)
+    # Befehle laufen nacheinander in der Warteschlange des Dobot, der Saugnapf
+    # schaltet erst, wenn die Bewegung davor abgeschlossen ist
+    bot.move_to(10, -241, -41, 0)
+    bot.move_to(10, -241, -44, 0)
     bot.suck(True)
-    bot.move_to(250, 0, 50, 0)
+    bot.wait(SUCTION_TIME_MS)
+    bot.move_to(*CAMERA_POS)
     print("[AKTION] Bauteil erfasst.")
 
+def camera_arrival():
+    """
+    Gibt eine Funktion zurück, die True liefert, sobald der Arm wieder an der
+    Kameraposition steht. Nach place() steht er dort noch, bevor die Befehle aus
+    pick() ausgeführt werden - zählt also erst, nachdem er sie verlassen hat.
+    """
+    left = False
+
+    def arrived():
+        nonlocal left
+        near = math.dist(bot.pose()[:3], CAMERA_POS[:3]) < CAMERA_POS_TOLERANCE
+        left = left or not near
+        return left and near
+
+    return arrived
+
 def getColor():
-    bot.move_to(250, 0, 50, 0, wait=True)
+    # Nicht auf die Ankunft warten: die Farbe wird schon während der Fahrt zur
+    # Kamera erkannt, danach folgen die Einsortier-Befehle direkt in der Warteschlange
     print("[AKTION] Farbe wird analysiert...")
-    color = identify()
-    time.sleep(1)
+    color = identify(arrived=camera_arrival())
     print(f"Farbe erkannt. Das Teil ist {color}.")
     return color
 
 def place(color):
     print(f"[ACTION] Bauteil wird einsortiert für Farbe {color}...")
-    time.sleep(1)
     
     if color == "none":
         print("[ACTION] Keine Farbe erkannt.")
@@ -37,35 +74,35 @@ def place(color):
         return
     
     if color == "blue":
-        bot.move_to(30, 245, -20, 83, wait=True)
+        bot.move_to(30, 245, -20, 83)
         bot.suck(False)
-        print("[ACTION] Place abgeschlossen.")
         bot.move_to(250, 0, 50, 0, wait=True)
+        print("[ACTION] Place abgeschlossen.")
         return
 
     if color == "green":
-        bot.move_to(91, 262, 20, 70, wait=True)
-        bot.move_to(155, 245, -20, 0, wait=True)
+        bot.move_to(91, 262, 20, 70)
+        bot.move_to(155, 245, -20, 0)
         bot.suck(False)
-        print("[ACTION] Place abgeschlossen.")
-        bot.move_to(91, 262, 20, 70, wait=True)
+        bot.move_to(91, 262, 20, 70)
         bot.move_to(250, 0, 50, 0, wait=True)
+        print("[ACTION] Place abgeschlossen.")
         return
     
     if color == "red":
-        bot.move_to(91, 262, -20, 70, wait=True)
+        bot.move_to(91, 262, -20, 70)
         bot.suck(False)
-        print("[ACTION] Place abgeschlossen.")
         bot.move_to(250, 0, 50, 0, wait=True)
+        print("[ACTION] Place abgeschlossen.")
         return
     
     if color == "yellow":
-        bot.move_to(91, 262, 20, 70, wait=True)
-        bot.move_to(-72, 220, 7, 108, wait=True)
+        bot.move_to(91, 262, 20, 70)
+        bot.move_to(-72, 220, 7, 108)
         bot.suck(False)
-        print("[ACTION] Place abgeschlossen.")
-        bot.move_to(91, 262, 20, 70, wait=True)
+        bot.move_to(91, 262, 20, 70)
         bot.move_to(250, 0, 50, 0, wait=True)
+        print("[ACTION] Place abgeschlossen.")
         return
     
 def programm():
@@ -76,14 +113,32 @@ def programm():
         return "none"
     place(color)
     print(f"RESULT:{color}")
+    return color
 
-def main():
+def close():
+    """Saugnapf aus und Kamera freigeben"""
+    identify_color.close()
+    if bot is not None:
+        bot.suck(False)
+
+def run_routine(on_result=None):
+    """Sortiert Bauteile, bis keines mehr erkannt wird; gibt die Anzahl zurück"""
+    count = 0
     while True:
         result = programm()
         if result == "none":
             print("[INFO] Keine weiteren Bauteile erkannt. Beende Programm.")
-            break
-        time.sleep(1)
+            return count
+        count += 1
+        if on_result:
+            on_result(result)
+
+def main():
+    connect()
+    try:
+        run_routine()
+    finally:
+        close()
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Dauerhaft laufender Roboter-Prozess
+
+Wird einmal vom Backend gestartet und hält Roboter und Kamera verbunden.
+Aufträge kommen zeilenweise als JSON über stdin, Ereignisse gehen zeilenweise
+als JSON über stdout. Alle übrigen Ausgaben der Routinen landen auf stderr.
+
+    stdin:  {"cmd": "start", "job": 1}
+            {"cmd": "ping"}
+            {"cmd": "shutdown"}
+
+    stdout: {"event": "ready", "routine": "pick"}
+            {"event": "part", "job": 1, "color": "red"}
+            {"event": "done", "job": 1, "count": 3, "duration": 41.2}
+            {"event": "error", "job": 1, "message": "..."}
+            {"event": "pong"}
+
+    py ./scripts/robot_worker.py --routine pick
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+# stdout gehört dem Protokoll, print() der Routinen geht nach stderr
+protocol_out = sys.stdout
+
+
+def send_event(event, **data):
+    protocol_out.write(json.dumps({"event": event, **data}) + "\n")
+    protocol_out.flush()
+
+
+def load_routine(name):
+    """Importiert die Routine und verbindet den Roboter"""
+    if name == "pick":
+        import pick_and_place as routine
+        routine.connect()
+    elif name == "sort":
+        import cam_test as routine
+        routine.connect()
+        routine.setup_robot()
+    else:
+        raise ValueError(f"Unbekannte Routine: {name}")
+    return routine
+
+
+def run_job(routine, job):
+    start_time = time.monotonic()
+    try:
+        count = routine.run_routine(on_result=lambda color: send_event("part", job=job, color=color))
+        send_event("done", job=job, count=count, duration=round(time.monotonic() - start_time, 2))
+    except Exception as e:
+        print(f"[ERROR] Auftrag {job} fehlgeschlagen: {e}")
+        send_event("error", job=job, message=str(e))
+
+
+def shutdown(routine):
+    """Saugnapf aus und Kamera freigeben"""
+    try:
+        if hasattr(routine, "close"):
+            routine.close()
+        else:
+            routine.camera.close()
+            routine.set_suction(False)
+    except Exception as e:
+        print(f"[WARNING] Fehler beim Beenden: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dauerhaft laufender Roboter-Prozess")
+    parser.add_argument("--routine", choices=["pick", "sort"], default="pick",
+                        help="pick = pick_and_place.py, sort = cam_test.py (Kamera-Scan)")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            routine = load_routine(args.routine)
+        except Exception as e:
+            print(f"[ERROR] Initialisierung fehlgeschlagen: {e}")
+            send_event("error", job=None, message=str(e))
+            return 1
+
+        send_event("ready", routine=args.routine)
+
+        try:
+            for line in sys.stdin:
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    command = json.loads(line)
+                except json.JSONDecodeError:
+                    send_event("error", job=None, message=f"Ungültiger Auftrag: {line}")
+                    continue
+
+                cmd = command.get("cmd")
+                if cmd == "start":
+                    run_job(routine, command.get("job"))
+                elif cmd == "ping":
+                    send_event("pong")
+                elif cmd == "shutdown":
+                    break
+                else:
+                    send_event("error", job=command.get("job"), message=f"Unbekannter Befehl: {cmd}")
+        finally:
+            shutdown(routine)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
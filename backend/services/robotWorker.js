@@ -0,0 +1,129 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+// Der Python-Prozess wird einmal gestartet und hält Roboter und Kamera verbunden
+const PYTHON = process.env.ROBOT_PYTHON || 'py';
+const ROUTINE = process.env.ROBOT_ROUTINE || 'pick';
+const WORKER_SCRIPT = path.join(__dirname, '../scripts/robot_worker.py');
+const SHUTDOWN_TIMEOUT = 5000;
+
+let worker = null;
+let readyPromise = null;
+let nextJobId = 1;
+const jobs = new Map();
+
+function handleEvent(message) {
+    const job = jobs.get(message.job);
+
+    switch (message.event) {
+        case 'part':
+            if (job) job.onPart(message.color);
+            break;
+        case 'done':
+            if (job) {
+                jobs.delete(message.job);
+                job.resolve({ count: message.count, duration: message.duration });
+            }
+            break;
+        case 'error':
+            if (job) {
+                jobs.delete(message.job);
+                job.reject(new Error(message.message));
+            } else {
+                console.log('Robot-Worker Fehler:', message.message);
+            }
+            break;
+    }
+}
+
+function start() {
+    if (readyPromise) return readyPromise;
+
+    readyPromise = new Promise((resolve, reject) => {
+        const child = spawn(PYTHON, [WORKER_SCRIPT, '--routine', ROUTINE], {
+            cwd: path.join(__dirname, '..')
+        });
+        worker = child;
+
+        // Bei einem Startfehler (z.B. ENOENT) kommt evtl. nur 'error' und kein 'exit' -
+        // beide Fälle räumen auf, aber nur einmal pro Prozess
+        const handleTermination = (error) => {
+            if (worker !== child) return;
+
+            for (const job of jobs.values()) job.reject(error);
+            jobs.clear();
+
+            worker = null;
+            readyPromise = null;
+            reject(error);
+        };
+
+        readline.createInterface({ input: child.stdout }).on('line', (line) => {
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch {
+                console.log('Robot-Worker:', line);
+                return;
+            }
+
+            if (message.event === 'ready') {
+                console.log(`Robot-Worker bereit (Routine: ${message.routine})`);
+                resolve();
+            } else {
+                handleEvent(message);
+            }
+        });
+
+        readline.createInterface({ input: child.stderr }).on('line', (line) => console.log(line));
+
+        child.on('error', (error) => {
+            console.error('Robot-Worker konnte nicht gestartet werden:', error.message);
+            handleTermination(error);
+        });
+
+        child.on('exit', (code) => {
+            console.log(`Robot-Worker beendet (Code ${code})`);
+            handleTermination(new Error('Robot-Worker wurde beendet.'));
+        });
+    });
+
+    // Startfehler nicht doppelt melden - runJob gibt sie an den Aufrufer weiter
+    readyPromise.catch(() => { });
+    return readyPromise;
+}
+
+/**
+ * Startet einen Durchlauf der Routine.
+ * onPart wird für jedes einsortierte Teil sofort aufgerufen.
+ * Gibt { count, duration } zurück, sobald der Durchlauf abgeschlossen ist.
+ */
+async function runJob(onPart = () => { }) {
+    await start();
+
+    const jobId = nextJobId++;
+    return new Promise((resolve, reject) => {
+        jobs.set(jobId, { onPart, resolve, reject });
+        worker.stdin.write(JSON.stringify({ cmd: 'start', job: jobId }) + '\n');
+    });
+}
+
+/**
+ * Beendet den Worker (Saugnapf aus, Kamera frei) und wartet, bis der Prozess beendet ist.
+ */
+function stop() {
+    const child = worker;
+    if (!child) return Promise.resolve();
+
+    return new Promise((resolve) => {
+        const timer = setTimeout(() => child.kill(), SHUTDOWN_TIMEOUT);
+        child.once('exit', () => {
+            clearTimeout(timer);
+            resolve();
+        });
+        child.stdin.write(JSON.stringify({ cmd: 'shutdown' }) + '\n');
+    });
+}
+
+module.exports = { start, runJob, stop };
@@ -0,0 +1,68 @@
+"""
+Lasttest des Sensor Servers mit simulierter Hardware
+
+Startet den kompletten SensorServer mit den simulierten Backends aus hardware/
+und gibt anschließend Durchsatz und Laufzeiten der einzelnen Tasks aus.
+
+    python benchmark.py --duration 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Muss vor dem Import der Konfiguration gesetzt sein
+os.environ.setdefault("SENSOR_SERVER_HARDWARE", "simulated")
+
+import main as sensor_main  # noqa: E402
+
+
+async def run_benchmark(server, duration):
+    """Lässt den Server `duration` Sekunden laufen"""
+    server.initialize_components()
+    if not server.start_servers():
+        server.logger.error("Kein Server konnte gestartet werden")
+
+    main_loop = asyncio.create_task(server.run_main_loop())
+    await asyncio.sleep(duration)
+    server.running = False
+    await main_loop
+
+
+def print_report(server, duration):
+    """Gibt die Startzeiten und die Statistik der periodischen Tasks aus"""
+    print(f"\n=== Benchmark ({duration:.0f}s, Backend: {sensor_main.HARDWARE_BACKEND}) ===")
+
+    print("\nStartzeiten:")
+    for name, seconds in server.startup_times.items():
+        print(f"  {name:<24}{seconds * 1000:>10.1f} ms")
+
+    print(f"\n{'Task':<20}{'Läufe':>8}{'pro s':>8}{'Ø ms':>10}{'max ms':>10}{'Fehler':>8}{'Überläufe':>11}")
+    for name, stats in server.task_stats.items():
+        runs = stats["runs"]
+        average = stats["total_time"] / runs * 1000 if runs else 0.0
+        print(f"{name:<20}{runs:>8}{runs / duration:>8.2f}{average:>10.1f}"
+              f"{stats['max_time'] * 1000:>10.1f}{stats['errors']:>8}{stats['overruns']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest des Sensor Servers mit simulierter Hardware")
+    parser.add_argument("--duration", type=float, default=30.0, help="Laufzeit in Sekunden")
+    parser.add_argument("--no-opcua", action="store_true", help="OPC UA Server nicht starten")
+    args = parser.parse_args()
+
+    if args.no_opcua:
+        sensor_main.ENABLE_OPCUA_SERVER = False
+
+    server = sensor_main.SensorServer()
+    try:
+        asyncio.run(run_benchmark(server, args.duration))
+        print_report(server, args.duration)
+    finally:
+        server.cleanup()
+        sensor_main.shutdown_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 """
 Konfigurationsdatei für den Raspberry Pi Sensor Server
 """
+import os
 
 # OPC UA Server Konfiguration
 OPCUA_ENDPOINT = "opc.tcp://0.0.0.0:4840"
@@ -8,24 +9,106 @@ OPCUA_SERVER_NAME = "RaspberryPi :: Server"
 CERTIFICATE_PATH = "certificates/server_cert.pem"
 PRIVATE_KEY_PATH = "certificates/server_key.pem"
 
+# Totbänder für OPC UA Aktualisierungen: (absolut, prozentual zum zuletzt veröffentlichten Wert)
+# Ein Wert wird nur geschrieben, wenn er eine der beiden Schwellen überschreitet
+# (eine Änderung genau um die Schwelle, z.B. ein 0.1 °C-Schritt des DHT22, wird nicht geschrieben).
+OPCUA_DEADBANDS = {
+    "Temperature": (0.1, 0.0),
+    "Humidity": (0.5, 0.0),
+    "Color": (2, 0.0),
+    "FanStatus": (0, 0.0),
+}
+
+# OPC UA Historie (HistoryRead), lokal in SQLite gespeichert
+OPCUA_HISTORY_ENABLED = True
+OPCUA_HISTORY_PATH = "history/opcua_history.sqlite"
+OPCUA_HISTORY_MAX_RECORDS = 50000  # pro Variable
+OPCUA_HISTORY_RETENTION_HOURS = 168  # 7 Tage
+
 # TCP Server Konfiguration
 TCP_HOST = "0.0.0.0"
 TCP_PORT = 5000
+TCP_CLIENT_QUEUE_SIZE = 16  # Nachrichten pro Client, bei Überlauf wird die älteste verworfen
+TCP_HANDSHAKE_TIMEOUT = 0.5  # Sekunden, Wartezeit auf die Formatanfrage ("JSON" oder "BIN", optional "RESUME <seq>")
+
+# Komponenten (deaktivierte Komponenten werden weder importiert noch initialisiert)
+ENABLE_TEMPERATURE_SENSOR = True
+ENABLE_LED = True
+ENABLE_CAMERA = True
+ENABLE_FAN = True
+ENABLE_TCP_SERVER = True
+ENABLE_OPCUA_SERVER = True
+ENABLE_RECORDER = True
+ENABLE_OUTBOX = True
+
+# Hardware-Backend: "auto" (echte Hardware, Simulation falls die Bibliothek fehlt),
+# "real" oder "simulated". Kann über die Umgebungsvariable SENSOR_SERVER_HARDWARE gesetzt werden.
+HARDWARE_BACKEND = os.environ.get("SENSOR_SERVER_HARDWARE", "auto")
+
+# Simulation (deterministisch über SIMULATION_SEED)
+SIMULATION_SEED = 42
+SIM_GPIO_LATENCY = 0.0  # Sekunden pro GPIO-/PWM-Zugriff
+SIM_DHT_LATENCY = 0.25  # Sekunden pro DHT22-Lesevorgang
+SIM_DHT_FAILURE_RATE = 0.2  # Anteil fehlgeschlagener DHT22-Lesevorgänge
+SIM_CAMERA_LATENCY = 0.033  # Sekunden pro Bild (~30 fps)
+SIM_CAMERA_FAILURE_RATE = 0.0  # Anteil fehlgeschlagener Aufnahmen
 
 # GPIO Pin Konfiguration
 DHT_PIN = 4
 FAN_PIN = 13
 LED_PIN = 23
 
+# DHT22 (siehe sensors/temperature_sensor.py)
+DHT_MAX_BACKOFF = 30.0  # Sekunden, größter Abstand zwischen Leseversuchen nach wiederholten Fehlern
+DHT_MEDIAN_WINDOW = 5  # Anzahl der letzten Messungen für den Median-Filter
+DHT_OUTLIER_LIMITS = (2.0, 10.0)  # Maximale Abweichung vom Median: °C, % rel. Feuchte
+DHT_MAX_AGE = 30.0  # Sekunden, ältere Messwerte gelten als ungültig
+
 # Sensor Konfiguration
 FAN_TEMPERATURE_THRESHOLD = 25.0  # in °C
 MIN_DIFF = 0.5
 
+# Lüfterregelung (siehe controllers/fan_control.py, Abstimmung: python -m controllers.fan_control)
+FAN_CONTROL_STRATEGY = "linear"  # "linear" (bisherige Kennlinie), "pid" oder "hysteresis"
+FAN_SETPOINT = 26.0  # Solltemperatur in °C für "pid" und "hysteresis"
+FAN_PID_GAINS = (8.0, 0.5, 0.0)  # kp, ki, kd (ki = kd = 0: P-Regler, kd = 0: PI-Regler)
+FAN_HYSTERESIS = 1.0  # Schaltabstand in °C für "hysteresis"
+FAN_MIN_DUTY = 20.0  # Kleinster Duty Cycle in %, bei dem der Lüfter sicher läuft
+FAN_MAX_STEP = 5.0  # Maximale Änderung des Duty Cycle in % pro Sekunde
+FAN_MIN_CHANGE = 2.0  # Kleinere Änderungen des Duty Cycle in % werden nicht geschrieben
+
+# Kamera Konfiguration
+CAMERA_CAPTURE_MODE = "preview"  # "preview" (niedrige Auflösung, schnell) oder "still" (volle Auflösung)
+CAMERA_PREVIEW_SIZE = (320, 240)
+CAMERA_ROI = None  # (x, y, Breite, Höhe) relativ zur Bildgröße (0.0 - 1.0), None = ganzes Bild
+CAMERA_SAMPLE_STEP = 1  # Nur jedes n-te Pixel je Richtung auswerten
+CAMERA_STREAMING = True  # Hintergrund-Thread erfasst fortlaufend Bilder
+CAMERA_RING_SIZE = 32  # Anzahl der gepufferten Bildstatistiken für zeitliche Mittelwerte
+
+# Telemetrie-Rekorder (binäre Aufzeichnung aller Messwerte, siehe storage/recorder.py)
+RECORDER_PATH = "recordings"
+RECORDER_SEGMENT_HOURS = 24  # Neues Segment 24 h nach dessen erstem Datensatz (~2 MB bei 1 Messwert/s)
+RECORDER_MAX_SEGMENTS = 90  # Ältere Segmente werden gelöscht (0 = alle behalten)
+RECORDER_FLUSH_RECORDS = 10  # Datensätze, nach denen auf die SD-Karte geschrieben wird
+
+# Outbox (dauerhafte Warteschlange zum Nachliefern nach Verbindungsabbrüchen, siehe storage/outbox.py)
+OUTBOX_PATH = "outbox/outbox.sqlite"
+OUTBOX_MAX_RECORDS = 200000  # ca. 2,3 Tage bei 1 Messwert/s
+OUTBOX_BATCH_SIZE = 500  # Messwerte pro Block beim Nachliefern
+
 # Logging Konfiguration
 LOG_DIR = "logs"
 LOG_FILE = "latest.log"
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_LEVEL = "INFO"
+LOG_QUEUE_SIZE = 10000  # Einträge; bei voller Queue werden neue Einträge verworfen und gezählt
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotation ab dieser Dateigröße
+LOG_ROTATE_HOURS = 24  # Rotation spätestens nach dieser Zeit
+LOG_ARCHIVE_COUNT = 30  # Anzahl aufbewahrter .tar.gz Archive (0 = alle)
 
 # Hauptschleife Konfiguration
-SENSOR_READ_INTERVAL = 1  # Sekunden
+SENSOR_READ_INTERVAL = 1  # Sekunden, Takt für Veröffentlichung über OPC UA/TCP
+TEMPERATURE_READ_INTERVAL = 2  # Sekunden, der DHT22 liefert höchstens alle 2 s neue Werte
+COLOR_READ_INTERVAL = 0.5  # Sekunden
+FAN_CONTROL_INTERVAL = 1  # Sekunden
+LED_BLINK_INTERVAL = 1  # Sekunden
@@ -0,0 +1,281 @@
+"""
+Regelung der Lüfterdrehzahl
+
+Eine Regelstrategie berechnet aus der Temperatur den gewünschten Duty Cycle:
+    linear     - bisheriges Verhalten: Duty steigt linear über FAN_TEMPERATURE_THRESHOLD
+    pid        - P/PI/PID-Regler auf FAN_SETPOINT (P bzw. PI über ki = 0 bzw. kd = 0)
+    hysteresis - Zweipunktregler, ein/aus mit Schaltabstand FAN_HYSTERESIS
+
+Die FanControlEngine begrenzt die Änderungsrate des Ausgangs und unterdrückt
+kleine Änderungen, damit der PWM-Ausgang nur bei echten Änderungen geschrieben
+wird. Mit der ThermalPlant lassen sich die Strategien ohne Hardware vergleichen
+und die Parameter abstimmen:
+
+    python -m controllers.fan_control --duration 7200
+"""
+
+import argparse
+import random
+import time
+
+from config import (FAN_CONTROL_INTERVAL, FAN_CONTROL_STRATEGY, FAN_HYSTERESIS, FAN_MAX_STEP, FAN_MIN_CHANGE,
+                    FAN_MIN_DUTY, FAN_PID_GAINS, FAN_SETPOINT, FAN_TEMPERATURE_THRESHOLD, MIN_DIFF,
+                    TEMPERATURE_READ_INTERVAL)
+
+
+def _clamp(value, lower, upper):
+    return max(lower, min(value, upper))
+
+
+class LinearStrategy:
+    """Bisherige Kennlinie: ab Schwelle + MIN_DIFF 10 % Duty pro °C über der Schwelle"""
+
+    def __init__(self, threshold=FAN_TEMPERATURE_THRESHOLD, min_diff=MIN_DIFF, gain=10.0):
+        self.threshold = threshold
+        self.min_diff = min_diff
+        self.gain = gain
+
+    def reset(self):
+        pass
+
+    def update(self, temperature, dt):
+        if temperature < self.threshold + self.min_diff:
+            return 0.0
+        return min(100.0, (temperature - self.threshold) * self.gain)
+
+
+class PIDStrategy:
+    """
+    PID-Regler für die Temperatur (Ausgang: Duty Cycle 0-100 %).
+    Der I-Anteil ist auf den Stellbereich begrenzt (Anti-Windup), der D-Anteil
+    wirkt auf die Messung statt auf die Regelabweichung. Unterhalb von
+    `min_duty` läuft der Lüfter nicht sicher an und wird abgeschaltet.
+    """
+
+    def __init__(self, setpoint=FAN_SETPOINT, kp=FAN_PID_GAINS[0], ki=FAN_PID_GAINS[1], kd=FAN_PID_GAINS[2],
+                 min_duty=FAN_MIN_DUTY, max_duty=100.0):
+        self.setpoint = setpoint
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.min_duty = min_duty
+        self.max_duty = max_duty
+        self.reset()
+
+    def reset(self):
+        self._integral = 0.0
+        self._last_temperature = None
+        self._running = False
+
+    def update(self, temperature, dt):
+        error = temperature - self.setpoint
+
+        derivative = 0.0
+        if self._last_temperature is not None and dt > 0:
+            derivative = (temperature - self._last_temperature) / dt
+        self._last_temperature = temperature
+
+        self._integral = _clamp(self._integral + self.ki * error * dt, 0.0, self.max_duty)
+        output = _clamp(self.kp * error + self._integral + self.kd * derivative, 0.0, self.max_duty)
+
+        # Ein laufender Lüfter wird erst unter der halben Mindestdrehzahl abgeschaltet
+        threshold = self.min_duty / 2 if self._running else self.min_duty
+        if output < threshold:
+            self._running = False
+            return 0.0
+
+        self._running = True
+        return max(output, self.min_duty)
+
+
+class HysteresisStrategy:
+    """Zweipunktregler: ein ab setpoint + band/2, aus unter setpoint - band/2"""
+
+    def __init__(self, setpoint=FAN_SETPOINT, band=FAN_HYSTERESIS, duty=100.0):
+        self.setpoint = setpoint
+        self.on_temperature = setpoint + band / 2
+        self.off_temperature = setpoint - band / 2
+        self.duty = duty
+        self.reset()
+
+    def reset(self):
+        self._on = False
+
+    def update(self, temperature, dt):
+        if temperature >= self.on_temperature:
+            self._on = True
+        elif temperature <= self.off_temperature:
+            self._on = False
+        return self.duty if self._on else 0.0
+
+
+STRATEGIES = {
+    "linear": LinearStrategy,
+    "pid": PIDStrategy,
+    "hysteresis": HysteresisStrategy,
+}
+
+
+def create_strategy(name=FAN_CONTROL_STRATEGY):
+    """Erzeugt die Regelstrategie mit den Parametern aus config.py"""
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Unbekannte Regelstrategie: {name} (möglich: {', '.join(STRATEGIES)})")
+
+
+class FanControlEngine:
+    """
+    Wendet eine Regelstrategie an und glättet ihren Ausgang:
+    - die Änderung pro Sekunde ist auf `max_step` % begrenzt (Ein- und Ausschalten sofort)
+    - Änderungen kleiner als `min_change` % werden nicht weitergegeben
+    Ohne gültige Temperatur bleibt der letzte Ausgang erhalten.
+    """
+
+    def __init__(self, strategy, max_step=FAN_MAX_STEP, min_change=FAN_MIN_CHANGE):
+        self.strategy = strategy
+        self.max_step = max_step
+        self.min_change = min_change
+        self.duty = 0.0
+        self.changes = 0
+        self._last_update = None
+
+    def reset(self):
+        """Beginnt neu, z.B. nach dem Wechsel von manuellem in automatischen Betrieb"""
+        self.strategy.reset()
+        self._last_update = None
+
+    def update(self, temperature, now=None):
+        """Berechnet den neuen Duty Cycle (0-100 %) für die gemessene Temperatur"""
+        now = time.monotonic() if now is None else now
+        dt = 0.0 if self._last_update is None else now - self._last_update
+        self._last_update = now
+
+        if temperature is None:
+            return self.duty
+
+        target = self.strategy.update(temperature, dt)
+
+        if target > 0 and self.duty > 0:
+            if self.max_step and dt > 0:
+                step = self.max_step * dt
+                target = _clamp(target, self.duty - step, self.duty + step)
+            if abs(target - self.duty) < self.min_change:
+                return self.duty
+
+        target = round(target, 1)
+        if target != self.duty:
+            self.duty = target
+            self.changes += 1
+        return self.duty
+
+
+class ThermalPlant:
+    """
+    Einfaches thermisches Modell des Gehäuses zum Abstimmen ohne Hardware.
+    Ohne Lüfter stellt sich ambient + heat_rise * Last ein, bei 100 % Duty ist
+    der Wärmeübergang um den Faktor 1 + fan_gain größer. Gemessen wird wie
+    beim DHT22 mit 0,1 °C Auflösung und etwas Rauschen.
+    """
+
+    def __init__(self, ambient=22.0, heat_rise=10.0, fan_gain=4.0, time_constant=600.0, noise=0.05, seed=0):
+        self.ambient = ambient
+        self.heat_rise = heat_rise
+        self.fan_gain = fan_gain
+        self.time_constant = time_constant
+        self.noise = noise
+        self.temperature = ambient + 2.0
+        self._rng = random.Random(seed)
+
+    def step(self, duty, dt, load=1.0):
+        conductance = 1.0 + self.fan_gain * duty / 100.0
+        heating = self.heat_rise * load - conductance * (self.temperature - self.ambient)
+        self.temperature += heating / self.time_constant * dt
+        return self.temperature
+
+    def measure(self):
+        return round(self.temperature + self._rng.gauss(0.0, self.noise), 1)
+
+
+def default_load(t, duration):
+    """Lastprofil: Volllast, dann Teillast, dann Überlast"""
+    if t < duration / 3:
+        return 1.0
+    if t < 2 * duration / 3:
+        return 0.6
+    return 1.2
+
+
+def simulate(strategy, duration=7200.0, interval=FAN_CONTROL_INTERVAL, sensor_interval=TEMPERATURE_READ_INTERVAL,
+             load=default_load, plant=None, settle_time=900.0):
+    """
+    Regelt die ThermalPlant `duration` Sekunden lang mit der angegebenen Strategie.
+    Gibt Kennzahlen zurück; die Regelabweichung wird erst nach `settle_time` und
+    nur für Strategien mit Sollwert gewertet (die lineare Kennlinie hat keinen).
+    """
+    setpoint = getattr(strategy, "setpoint", None)
+    plant = plant or ThermalPlant()
+    engine = FanControlEngine(strategy)
+
+    measured = None
+    next_measurement = 0.0
+    switches = 0
+    squared_error = 0.0
+    samples = 0
+    max_temperature = plant.temperature
+    duty_sum = 0.0
+    steps = int(duration / interval)
+
+    for i in range(steps):
+        t = i * interval
+        if t >= next_measurement:
+            measured = plant.measure()
+            next_measurement += sensor_interval
+
+        previous = engine.duty
+        duty = engine.update(measured, now=t)
+        if (previous > 0) != (duty > 0):
+            switches += 1
+
+        plant.step(duty, interval, load(t, duration))
+        max_temperature = max(max_temperature, plant.temperature)
+        duty_sum += duty
+        if setpoint is not None and t >= settle_time:
+            squared_error += (plant.temperature - setpoint) ** 2
+            samples += 1
+
+    return {
+        "rms_error": (squared_error / samples) ** 0.5 if samples else None,
+        "max_temperature": max_temperature,
+        "mean_duty": duty_sum / steps if steps else 0.0,
+        "pwm_writes": engine.changes,
+        "switches": switches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleich der Lüfter-Regelstrategien an einem simulierten Gehäuse")
+    parser.add_argument("--duration", type=float, default=7200.0, help="Simulierte Dauer in Sekunden")
+    parser.add_argument("--kp", type=float, default=FAN_PID_GAINS[0])
+    parser.add_argument("--ki", type=float, default=FAN_PID_GAINS[1])
+    parser.add_argument("--kd", type=float, default=FAN_PID_GAINS[2])
+    args = parser.parse_args()
+
+    candidates = {
+        "linear": LinearStrategy(),
+        "hysteresis": HysteresisStrategy(),
+        "pid": PIDStrategy(kp=args.kp, ki=args.ki, kd=args.kd),
+    }
+
+    print(f"Sollwert {FAN_SETPOINT} °C (pid, hysteresis), Kennlinie ab {FAN_TEMPERATURE_THRESHOLD + MIN_DIFF} °C "
+          f"(linear), {args.duration:.0f} s simuliert\n")
+    print(f"{'Strategie':<12}{'RMS °C':>8}{'max °C':>8}{'Ø Duty':>8}{'PWM-Writes':>12}{'Ein/Aus':>9}")
+    for name, strategy in candidates.items():
+        result = simulate(strategy, duration=args.duration)
+        rms_error = "-" if result["rms_error"] is None else f"{result['rms_error']:.2f}"
+        print(f"{name:<12}{rms_error:>8}{result['max_temperature']:>8.1f}"
+              f"{result['mean_duty']:>7.0f}%{result['pwm_writes']:>12}{result['switches']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,35 @@
 import logging
 
-import RPi.GPIO as GPIO
-
-from config import FAN_TEMPERATURE_THRESHOLD, MIN_DIFF
+from config import FAN_CONTROL_STRATEGY
+from controllers.fan_control import FanControlEngine, create_strategy
+from hardware.gpio import get_gpio
 
 
 class FanController:
-    def __init__(self, pin, logger=None):
+    """
+    Lüfter über PWM. Im Automatikbetrieb bestimmt die FanControlEngine den
+    Duty Cycle; der PWM-Ausgang wird nur geschrieben, wenn sich der Wert ändert.
+    """
+
+    def __init__(self, pin, logger=None, strategy=FAN_CONTROL_STRATEGY):
         self.pin = pin or 13
         self.status = False
+        self.duty = 0
         self.auto_mode = True
         self.logger = logger or logging.getLogger(__name__)
+        self.gpio = None
         self.pwm_fan = None
+        self.engine = FanControlEngine(create_strategy(strategy))
+        self.pwm_writes = 0
+        self.suppressed_writes = 0
 
         try:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self.pin, GPIO.OUT)
-            self.pwm_fan = GPIO.PWM(self.pin, 100)
+            self.gpio = get_gpio()
+            self.gpio.setmode(self.gpio.BCM)
+            self.gpio.setup(self.pin, self.gpio.OUT)
+            self.pwm_fan = self.gpio.PWM(self.pin, 100)
             self.pwm_fan.start(0)
-            self.logger.info(f"Lüfter-Controller mit PWM initialisiert auf Pin {self.pin}")
+            self.logger.info(f"Lüfter-Controller mit PWM initialisiert auf Pin {self.pin} (Regelung: {strategy})")
         except Exception as e:
             self.logger.error(f"Fehler beim Initialisieren des Lüfter-Controllers: {e}")
             raise
@@ -28,35 +39,48 @@ class FanController:
         Schaltet Lüfter ein/aus.
         Wenn speed angegeben (0-100), wird PWM Duty Cycle gesetzt.
         """
+        status = bool(status)
+        duty = max(0, min(speed, 100)) if status else 0  # Speed auf 0-100 begrenzen
+
+        if status == self.status and duty == self.duty:
+            self.suppressed_writes += 1
+            return True
+
         try:
-            if status:
-                duty = max(0, min(speed, 100))  # Speed auf 0-100 begrenzen
-                self.pwm_fan.ChangeDutyCycle(duty)
-                self.logger.info(f"Lüfter eingeschaltet mit Speed {duty}%")
-                self.status = True
+            self.pwm_fan.ChangeDutyCycle(duty)
+            self.pwm_writes += 1
+
+            if status != self.status:
+                self.logger.info(f"Lüfter eingeschaltet mit Speed {duty}%" if status else "Lüfter ausgeschaltet")
             else:
-                self.pwm_fan.ChangeDutyCycle(0)
-                self.logger.info("Lüfter ausgeschaltet")
-                self.status = False
+                self.logger.debug(f"Lüfter-Speed {duty}%")
+
+            self.status = status
+            self.duty = duty
             return True
         except Exception as e:
             self.logger.error(f"Fehler beim Schalten des Lüfters: {e}")
             return False
 
     def auto_control(self, temperature):
-        if not self.auto_mode or temperature is None:
+        if not self.auto_mode:
             return self.status
 
-        activateTemp = FAN_TEMPERATURE_THRESHOLD + MIN_DIFF
-        if temperature >= activateTemp:
-            unrounded_speed = min(100, (temperature - FAN_TEMPERATURE_THRESHOLD) * 10)
-            speed = round(unrounded_speed, 2)
-            return self.set_fan(True, speed=speed)
-        else:
-            return self.set_fan(False)
+        # Auch ohne Messwert aufrufen: die Engine hält dann den Duty Cycle,
+        # führt aber den Zeitpunkt nach, damit nach einer Lücke im DHT22
+        # die Änderungsrate weiter begrenzt bleibt.
+        duty = self.engine.update(temperature)
+        return self.set_fan(duty > 0, speed=duty)
 
     def set_mode(self, auto_mode):
+        if auto_mode == self.auto_mode:
+            return
+
         self.auto_mode = auto_mode
+        if auto_mode:
+            # Regler ohne den Zustand von vor dem manuellen Betrieb neu starten
+            self.engine.reset()
+            self.engine.duty = self.duty
         mode_text = "Automatik" if auto_mode else "Manuell"
         self.logger.info(f"Lüftersteuerung: {mode_text}-Modus aktiviert")
 
@@ -65,6 +89,7 @@ class FanController:
             self.set_fan(False)
             if self.pwm_fan:
                 self.pwm_fan.stop()
-            self.logger.info("Lüfter ausgeschaltet und PWM gestoppt (Cleanup)")
+            self.logger.info(f"Lüfter ausgeschaltet und PWM gestoppt (Cleanup, {self.pwm_writes} PWM-Writes, "
+                             f"{self.suppressed_writes} unveränderte Werte übersprungen)")
         except Exception as e:
             self.logger.warning(f"Fehler beim Lüfter-Cleanup: {e}")
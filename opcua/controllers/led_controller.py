@@ -1,18 +1,20 @@
 import asyncio
 import logging
 
-import RPi.GPIO as GPIO
+from hardware.gpio import get_gpio
 
 
 class LEDController:
     def __init__(self, pin, logger=None):
         self.led_pin = pin
         self.logger = logger or logging.getLogger(__name__)
+        self.gpio = None
 
         try:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self.led_pin, GPIO.OUT)
-            GPIO.output(self.led_pin, GPIO.LOW)
+            self.gpio = get_gpio()
+            self.gpio.setmode(self.gpio.BCM)
+            self.gpio.setup(self.led_pin, self.gpio.OUT)
+            self.gpio.output(self.led_pin, self.gpio.LOW)
             self.logger.info(f"LED Controller auf Pin {self.led_pin} initialisiert")
         except Exception as e:
             self.logger.error(f"Fehler bei der Initialisierung der LED: {e}")
@@ -24,26 +26,25 @@ class LEDController:
             self.on()
             await asyncio.sleep(duration)
             self.off()
-            self.logger.info(" ")
         except Exception as e:
             self.logger.error(f"Fehler beim Blinken der LED: {e}")
 
     def on(self):
         try:
-            GPIO.output(self.led_pin, GPIO.HIGH)
+            self.gpio.output(self.led_pin, self.gpio.HIGH)
         except Exception as e:
             self.logger.error(f"Fehler beim Einschalten der LED: {e}")
 
     def off(self):
         try:
-            GPIO.output(self.led_pin, GPIO.LOW)
+            self.gpio.output(self.led_pin, self.gpio.LOW)
         except Exception as e:
             self.logger.error(f"Fehler beim Ausschalten der LED: {e}")
 
     def cleanup(self):
         try:
-            GPIO.output(self.led_pin, GPIO.LOW)
-            GPIO.cleanup(self.led_pin)
+            self.gpio.output(self.led_pin, self.gpio.LOW)
+            self.gpio.cleanup(self.led_pin)
             self.logger.info("LED Controller Ressourcen freigegeben")
         except Exception as e:
             self.logger.warning(f"Fehler beim Cleanup der LED: {e}")
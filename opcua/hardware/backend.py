@@ -0,0 +1,44 @@
+"""
+Auswahl zwischen echter Hardware und simulierten Backends
+"""
+
+import logging
+import random
+import time
+
+from config import HARDWARE_BACKEND, SIMULATION_SEED
+
+logger = logging.getLogger(__name__)
+
+
+def use_simulation(device, real_available):
+    """
+    Entscheidet, ob für ein Gerät das simulierte Backend verwendet wird.
+    :param device: Name des Geräts (nur für das Logging).
+    :param real_available: Ob die Bibliothek für die echte Hardware importiert werden konnte.
+    """
+    backend = HARDWARE_BACKEND.lower()
+
+    if backend == "simulated":
+        return True
+
+    if backend == "real":
+        if not real_available:
+            raise RuntimeError(f"{device}: Hardware-Bibliothek nicht verfügbar (HARDWARE_BACKEND = 'real')")
+        return False
+
+    if not real_available:
+        logger.warning(f"{device}: Hardware oder Bibliothek nicht verfügbar - verwende Simulation")
+        return True
+    return False
+
+
+def create_rng(device):
+    """Erzeugt einen deterministischen Zufallsgenerator pro Gerät"""
+    return random.Random(f"{SIMULATION_SEED}:{device}")
+
+
+def simulate_latency(seconds, rng):
+    """Wartet `seconds` mit leichter, reproduzierbarer Streuung (±20 %)"""
+    if seconds > 0:
+        time.sleep(seconds * (0.8 + 0.4 * rng.random()))
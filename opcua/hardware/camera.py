@@ -0,0 +1,117 @@
+"""
+Kamera-Backend (picamera2 oder Simulation)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import SIM_CAMERA_FAILURE_RATE, SIM_CAMERA_LATENCY
+from hardware.backend import create_rng, simulate_latency, use_simulation
+
+try:
+    from picamera2 import MappedArray, Picamera2
+
+    PICAMERA2_AVAILABLE = True
+except ImportError:
+    PICAMERA2_AVAILABLE = False
+
+# Farben, die die simulierte Kamera nacheinander zeigt (R, G, B)
+SIMULATED_COLORS = [(200, 30, 30), (30, 180, 40), (30, 60, 200), (220, 200, 40)]
+SIMULATED_COLOR_DURATION = 5.0  # Sekunden pro Farbe
+
+
+class SimulatedRequest:
+    """Simulierter CompletedRequest mit Zugriff auf den Bildpuffer"""
+
+    def __init__(self, array):
+        self.array = array
+
+    def make_array(self, name="main"):
+        return self.array.copy()
+
+    def release(self):
+        pass
+
+
+class SimulatedCamera:
+    """
+    Simulierte Kamera mit dem von ImageProcessor genutzten Teil der
+    Picamera2-Schnittstelle. Der Bildpuffer wird einmal angelegt und pro
+    Aufnahme nur mit der aktuellen Farbe gefüllt.
+    """
+
+    def __init__(self, latency=SIM_CAMERA_LATENCY, failure_rate=SIM_CAMERA_FAILURE_RATE):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = create_rng("Kamera")
+        self._config = None
+        self._frame = None
+        self._started = None
+
+    def create_still_configuration(self, main=None):
+        return {"main": {"size": (1920, 1080), "format": "BGR888", **(main or {})}}
+
+    def create_preview_configuration(self, main=None):
+        return {"main": {"size": (640, 480), "format": "XBGR8888", **(main or {})}}
+
+    def configure(self, config):
+        self._config = config
+        width, height = config["main"]["size"]
+        channels = 3 if config["main"]["format"] in ("BGR888", "RGB888") else 4
+        self._frame = np.zeros((height, width, channels), dtype=np.uint8)
+
+    def camera_configuration(self):
+        return self._config
+
+    def start(self):
+        self._started = time.monotonic()
+
+    def stop(self):
+        self._started = None
+
+    def close(self):
+        self.stop()
+
+    def _next_frame(self):
+        if self._started is None:
+            raise RuntimeError("Kamera ist nicht gestartet")
+
+        simulate_latency(self.latency, self._rng)
+        if self._rng.random() < self.failure_rate:
+            raise RuntimeError("Simulierter Kamerafehler")
+
+        elapsed = time.monotonic() - self._started
+        color = SIMULATED_COLORS[int(elapsed / SIMULATED_COLOR_DURATION) % len(SIMULATED_COLORS)]
+        self._frame[..., :3] = color
+        return self._frame
+
+    def capture_array(self, name="main"):
+        return self._next_frame().copy()
+
+    def capture_request(self):
+        return SimulatedRequest(self._next_frame())
+
+
+def is_simulated():
+    """Gibt zurück, ob die simulierte Kamera verwendet wird"""
+    return use_simulation("Kamera", PICAMERA2_AVAILABLE and os.path.exists("/dev/video0"))
+
+
+def create_camera():
+    """Erzeugt die Kamera (Picamera2 oder die Simulation)"""
+    if is_simulated():
+        return SimulatedCamera()
+    return Picamera2()
+
+
+@contextmanager
+def map_request(request, stream="main"):
+    """Gibt den Bildpuffer einer Aufnahme ohne Kopie als NumPy-Array zurück"""
+    if isinstance(request, SimulatedRequest):
+        yield request.array
+    else:
+        with MappedArray(request, stream) as mapped:
+            yield mapped.array
@@ -0,0 +1,71 @@
+"""
+DHT22-Backend (adafruit_dht oder Simulation)
+"""
+
+import threading
+import time
+
+from config import SIM_DHT_FAILURE_RATE, SIM_DHT_LATENCY
+from hardware.backend import create_rng, simulate_latency, use_simulation
+
+try:
+    import adafruit_dht
+    import board
+
+    DHT_AVAILABLE = True
+except (ImportError, NotImplementedError, RuntimeError):
+    DHT_AVAILABLE = False
+
+# Der DHT22 liefert höchstens alle 2 Sekunden einen neuen Messwert
+DHT22_MIN_INTERVAL = 2.0
+
+
+class SimulatedDHT22:
+    """
+    Simulierter DHT22 mit der Schnittstelle von adafruit_dht.DHT22.
+    Wie die echte Bibliothek misst er höchstens alle 2 Sekunden neu und wirft
+    bei einem fehlgeschlagenen Lesevorgang einen RuntimeError.
+    """
+
+    def __init__(self, latency=SIM_DHT_LATENCY, failure_rate=SIM_DHT_FAILURE_RATE):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = create_rng("DHT22")
+        self._lock = threading.Lock()
+        self._last_read = 0.0
+        self._temperature = 24.0
+        self._humidity = 50.0
+
+    def measure(self):
+        with self._lock:
+            if time.monotonic() - self._last_read < DHT22_MIN_INTERVAL:
+                return
+            self._last_read = time.monotonic()
+
+            simulate_latency(self.latency, self._rng)
+            if self._rng.random() < self.failure_rate:
+                raise RuntimeError("Checksum did not validate. Try again.")
+
+            # Langsame Zufallsbewegung um realistische Raumwerte
+            self._temperature = min(max(self._temperature + self._rng.uniform(-0.3, 0.3), 15.0), 40.0)
+            self._humidity = min(max(self._humidity + self._rng.uniform(-1.0, 1.0), 20.0), 90.0)
+
+    @property
+    def temperature(self):
+        self.measure()
+        return round(self._temperature, 1)
+
+    @property
+    def humidity(self):
+        self.measure()
+        return round(self._humidity, 1)
+
+    def exit(self):
+        pass
+
+
+def create_dht22(pin):
+    """Erzeugt einen DHT22 am angegebenen BCM-Pin (oder die Simulation)"""
+    if use_simulation("DHT22", DHT_AVAILABLE):
+        return SimulatedDHT22()
+    return adafruit_dht.DHT22(getattr(board, f"D{pin}"), use_pulseio=False)
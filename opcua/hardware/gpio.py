@@ -0,0 +1,111 @@
+"""
+GPIO- und PWM-Backend (RPi.GPIO oder Simulation)
+"""
+
+import threading
+
+from config import SIM_GPIO_LATENCY
+from hardware.backend import create_rng, simulate_latency, use_simulation
+
+try:
+    import RPi.GPIO as RPI_GPIO
+
+    RPI_GPIO_AVAILABLE = True
+except (ImportError, RuntimeError):
+    RPI_GPIO = None
+    RPI_GPIO_AVAILABLE = False
+
+
+class SimulatedPWM:
+    """Simulierter PWM-Kanal mit der Schnittstelle von RPi.GPIO.PWM"""
+
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+        self.running = False
+        self.writes = 0
+
+    def start(self, duty_cycle):
+        self.gpio.access()
+        self.duty_cycle = duty_cycle
+        self.running = True
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.gpio.access()
+        self.duty_cycle = duty_cycle
+        self.writes += 1
+
+    def ChangeFrequency(self, frequency):
+        self.gpio.access()
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+class SimulatedGPIO:
+    """Simuliertes GPIO-Modul mit der Schnittstelle von RPi.GPIO"""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, latency=SIM_GPIO_LATENCY):
+        self.latency = latency
+        self.mode = None
+        self.pins = {}
+        self.writes = 0
+        self._rng = create_rng("GPIO")
+        self._lock = threading.Lock()
+
+    def access(self):
+        """Simuliert die Dauer eines Hardwarezugriffs"""
+        with self._lock:
+            self.writes += 1
+            simulate_latency(self.latency, self._rng)
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        if self.mode is not None and self.mode != mode:
+            raise ValueError("A different mode has already been set!")
+        self.mode = mode
+
+    def setup(self, pin, direction, initial=LOW):
+        self.pins[pin] = initial
+
+    def output(self, pin, value):
+        self.access()
+        self.pins[pin] = value
+
+    def input(self, pin):
+        return self.pins.get(pin, self.LOW)
+
+    def PWM(self, pin, frequency):
+        return SimulatedPWM(self, pin, frequency)
+
+    def cleanup(self, pin=None):
+        if pin is None:
+            self.pins.clear()
+            self.mode = None
+        else:
+            self.pins.pop(pin, None)
+
+
+_gpio = None
+_gpio_lock = threading.Lock()
+
+
+def get_gpio():
+    """Gibt das GPIO-Backend zurück (RPi.GPIO oder eine gemeinsame Simulation)"""
+    global _gpio
+    with _gpio_lock:
+        if _gpio is None:
+            _gpio = SimulatedGPIO() if use_simulation("GPIO", RPI_GPIO_AVAILABLE) else RPI_GPIO
+        return _gpio
@@ -5,18 +5,15 @@ import asyncio
 import os
 import signal
 import sys
-
-import RPi.GPIO as GPIO
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Lokale Imports
+# Komponenten (und damit RPi.GPIO, adafruit_dht, picamera2, opcua) werden
+# erst in initialize_components() importiert
 from config import *
-from controllers.fan_controller import FanController
-from controllers.led_controller import LEDController
-from sensors.image_processor import ImageProcessor
-from sensors.temperature_sensor import TemperatureHumiditySensor
-from servers.opcua_server import OPCUAServer
-from servers.tcp_server import ColorSensorServer
-from utils.logger import setup_logging
+from utils.logger import setup_logging, shutdown_logging
+from utils.telemetry import SensorSample
 
 
 class SensorServer:
@@ -36,6 +33,18 @@ class SensorServer:
         self.fan_controller = None
         self.tcp_server = None
         self.opcua_server = None
+        self.recorder = None
+        self.outbox = None
+        self.startup_times = {}
+        self.task_stats = {}  # Laufzeitstatistik der periodischen Tasks
+
+        # Zuletzt erfasste Werte, werden von den Erfassungs-Tasks aktualisiert
+        self.temperature = None
+        self.humidity = None
+        self.rgb = (0, 0, 0)
+        self.fan_status = False
+        self.fan_duty = 0
+        self.sample_seq = 0
 
         # Signal Handler für sauberes Beenden
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -47,63 +56,103 @@ class SensorServer:
         self.running = False
 
     def initialize_components(self):
-        """Initialisiert alle Komponenten mit Fehlerbehandlung"""
+        """
+        Initialisiert alle aktivierten Komponenten parallel mit Fehlerbehandlung.
+        Hardware- und Protokollbibliotheken werden erst beim Erzeugen der
+        jeweiligen Komponente importiert.
+        """
         self.logger.info("Initialisierung der Komponenten gestartet...")
+        started = time.perf_counter()
 
         script_dir = os.path.dirname(os.path.abspath(__file__))
 
         # Construct absolute paths for certificates and PKI structure
         # These absolute paths will be passed to OPCUAServer
-        absolute_certificate_path = os.path.join(script_dir, CERTIFICATE_PATH)
-        absolute_private_key_path = os.path.join(script_dir, PRIVATE_KEY_PATH)
+        self._certificate_path = os.path.join(script_dir, CERTIFICATE_PATH)
+        self._private_key_path = os.path.join(script_dir, PRIVATE_KEY_PATH)
+        self._history_path = os.path.join(script_dir, OPCUA_HISTORY_PATH) if OPCUA_HISTORY_ENABLED else None
+        self._recorder_path = os.path.join(script_dir, RECORDER_PATH)
+        self._outbox_path = os.path.join(script_dir, OUTBOX_PATH)
 
         # Ensure all necessary directories exist
-        os.makedirs(os.path.dirname(absolute_certificate_path), exist_ok=True)  # For server's own cert/key
+        os.makedirs(os.path.dirname(self._certificate_path), exist_ok=True)  # For server's own cert/key
+
+        components = [
+            ("temp_sensor", "Temperatursensor", ENABLE_TEMPERATURE_SENSOR, self._create_temperature_sensor),
+            ("led_controller", "LED Controller", ENABLE_LED, self._create_led_controller),
+            ("image_processor", "Bildverarbeitung", ENABLE_CAMERA, self._create_image_processor),
+            ("fan_controller", "Lüftersteuerung", ENABLE_FAN, self._create_fan_controller),
+            ("tcp_server", "TCP-Server", ENABLE_TCP_SERVER, self._create_tcp_server),
+            ("opcua_server", "OPC UA Server", ENABLE_OPCUA_SERVER, self._create_opcua_server),
+            ("recorder", "Telemetrie-Rekorder", ENABLE_RECORDER, self._create_recorder),
+            ("outbox", "Outbox", ENABLE_OUTBOX, self._create_outbox),
+        ]
+
+        enabled = [entry for entry in components if entry[2]]
+        for _, component_name, is_enabled, _ in components:
+            if not is_enabled:
+                self.logger.info(f"{component_name} ist deaktiviert")
+
+        with ThreadPoolExecutor(max_workers=max(1, len(enabled)), thread_name_prefix="Init") as executor:
+            futures = {
+                attribute: executor.submit(self._safe_init, factory, component_name)
+                for attribute, component_name, _, factory in enabled
+            }
+            for attribute, future in futures.items():
+                setattr(self, attribute, future.result())
+
+        self._connect_outbox()
+
+        self.startup_times["Initialisierung gesamt"] = time.perf_counter() - started
+        self.logger.info("Komponenteninitialisierung abgeschlossen")
 
-        # Temperatursensor
-        self.temp_sensor = self._safe_init(
-            TemperatureHumiditySensor,
-            "Temperatursensor",
-            logger=self.logger
-        )
+    def _create_temperature_sensor(self):
+        from sensors.temperature_sensor import TemperatureHumiditySensor
+        return TemperatureHumiditySensor(logger=self.logger)
 
-        # Ledsteuerung
-        self.led_controller = self._safe_init(
-            lambda: LEDController(LED_PIN, logger=self.logger),
-            "LED Controller",
-        )
+    def _create_led_controller(self):
+        from controllers.led_controller import LEDController
+        return LEDController(LED_PIN, logger=self.logger)
 
-        # Bildverarbeitung
-        self.image_processor = self._safe_init(
-            ImageProcessor,
-            "Bildverarbeitung",
-            logger=self.logger
-        )
+    def _create_image_processor(self):
+        from sensors.image_processor import ImageProcessor
+        return ImageProcessor(logger=self.logger)
 
-        # Lüftersteuerung
-        self.fan_controller = self._safe_init(
-            lambda: FanController(FAN_PIN, logger=self.logger),
-            "Lüftersteuerung",
-        )
+    def _create_fan_controller(self):
+        from controllers.fan_controller import FanController
+        return FanController(FAN_PIN, logger=self.logger)
 
-        # TCP Server
-        self.tcp_server = self._safe_init(
-            lambda: ColorSensorServer(TCP_HOST, TCP_PORT, logger=self.logger),
-            "TCP-Server",
-        )
+    def _create_tcp_server(self):
+        from servers.tcp_server import ColorSensorServer
+        return ColorSensorServer(TCP_HOST, TCP_PORT, logger=self.logger)
 
-        # OPC UA Server
-        self.opcua_server = self._safe_init(
-            lambda: OPCUAServer(OPCUA_ENDPOINT, OPCUA_SERVER_NAME,
-                                absolute_certificate_path, absolute_private_key_path,
-                                logger=self.logger),
-            "OPC UA Server",
-        )
+    def _create_opcua_server(self):
+        from servers.opcua_server import OPCUAServer
+        return OPCUAServer(OPCUA_ENDPOINT, OPCUA_SERVER_NAME,
+                           self._certificate_path, self._private_key_path,
+                           logger=self.logger, history_path=self._history_path)
 
-        self.logger.info("Komponenteninitialisierung abgeschlossen")
+    def _create_recorder(self):
+        from storage.recorder import TelemetryRecorder
+        return TelemetryRecorder(self._recorder_path, logger=self.logger)
+
+    def _create_outbox(self):
+        from storage.outbox import SampleOutbox
+        return SampleOutbox(self._outbox_path, logger=self.logger)
+
+    def _connect_outbox(self):
+        """Setzt die Sequenznummern nach einem Neustart fort und übergibt die Outbox an die Server"""
+        if not self.outbox:
+            return
+
+        self.sample_seq = self.outbox.last_seq()
+        for server in (self.tcp_server, self.opcua_server):
+            if server:
+                server.outbox = self.outbox
 
     def _safe_init(self, init_func, component_name, **kwargs):
-        """Sichere Initialisierung mit Fallback"""
+        """Sichere Initialisierung mit Fallback und Zeitmessung"""
+        started = time.perf_counter()
         try:
             component = init_func(**kwargs) if kwargs else init_func()
             self.logger.info(f"{component_name} erfolgreich initialisiert")
@@ -111,6 +160,13 @@ class SensorServer:
         except Exception as e:
             self.logger.error(f"Fehler bei der Initialisierung von {component_name}: {e}")
             return None
+        finally:
+            self.startup_times[component_name] = time.perf_counter() - started
+
+    def _log_startup_report(self):
+        """Gibt die gemessenen Startzeiten pro Komponente aus"""
+        report = ", ".join(f"{name}: {seconds:.2f}s" for name, seconds in self.startup_times.items())
+        self.logger.info(f"Startzeiten - {report}")
 
     def start_servers(self):
         """Startet alle Server"""
@@ -124,7 +180,11 @@ class SensorServer:
         # OPC UA Server starten
         opcua_started = False
         if self.opcua_server:
+            started = time.perf_counter()
             opcua_started = self.opcua_server.start()
+            self.startup_times["OPC UA Start"] = time.perf_counter() - started
+
+        self._log_startup_report()
 
         self.logger.info(f"Server-Status - TCP: {'OK' if tcp_started else 'FEHLER'}, "
                          f"OPC UA: {'OK' if opcua_started else 'FEHLER'}")
@@ -144,36 +204,123 @@ class SensorServer:
             await asyncio.sleep(1)
 
     async def run_main_loop(self):
-        """Hauptschleife für Sensordatenerfassung und -verarbeitung"""
+        """
+        Hauptschleife für Sensordatenerfassung und -verarbeitung.
+        Jede Quelle läuft als eigener, unabhängig getakteter Task, blockierende
+        Hardwarezugriffe werden in Threads ausgelagert.
+        """
         self.logger.info("Starte Hauptschleife...")
         self.logger.info("Drücken Sie STRG+C zum Beenden.")
 
         self.running = True
 
+        tasks = [
+            asyncio.create_task(self._run_periodic("Temperatur", TEMPERATURE_READ_INTERVAL,
+                                                   self._temperature_task)),
+            asyncio.create_task(self._run_periodic("Farberkennung", COLOR_READ_INTERVAL,
+                                                   self._color_task)),
+            asyncio.create_task(self._run_periodic("Lüfter", FAN_CONTROL_INTERVAL,
+                                                   self._fan_task)),
+            asyncio.create_task(self._run_periodic("Veröffentlichung", SENSOR_READ_INTERVAL,
+                                                   self._publish_task)),
+            asyncio.create_task(self._run_periodic("LED", LED_BLINK_INTERVAL,
+                                                   self.led_blink_task)),
+        ]
+
+        try:
+            while self.running:
+                await asyncio.sleep(0.2)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_periodic(self, name, interval, task_func):
+        """
+        Führt task_func in festem Takt aus. Die Laufzeit eines Durchlaufs wird vom
+        Intervall abgezogen, damit sich Verzögerungen nicht aufsummieren.
+        """
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        stats = self.task_stats.setdefault(name, {"runs": 0, "errors": 0, "overruns": 0,
+                                                  "total_time": 0.0, "max_time": 0.0})
+
         while self.running:
+            started = loop.time()
             try:
-                temperature, humidity = self._read_temperature_sensor()
-                rgb = self._get_rgb_values()
-                fan_status = self._control_fan(temperature)
+                await task_func()
+            except Exception as e:
+                stats["errors"] += 1
+                self.logger.error(f"Fehler im Task {name}: {e}", exc_info=True)
+
+            duration = loop.time() - started
+            stats["runs"] += 1
+            stats["total_time"] += duration
+            stats["max_time"] = max(stats["max_time"], duration)
+
+            next_run += interval
+            delay = next_run - loop.time()
+            if delay < 0:
+                # Durchlauf hat länger als das Intervall gedauert - Takt neu ausrichten
+                stats["overruns"] += 1
+                self.logger.debug(f"Task {name} hat den Takt um {-delay:.2f}s überschritten")
+                next_run = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def _temperature_task(self):
+        """Übernimmt den letzten gültigen DHT22-Wert (gelesen wird im Thread des Sensors)"""
+        self.temperature, self.humidity = self._read_temperature_sensor()
+
+    async def _color_task(self):
+        """Ermittelt die RGB-Werte in einem Executor-Thread"""
+        self.rgb = await asyncio.to_thread(self._get_rgb_values)
+
+    async def _fan_task(self):
+        """Regelt den Lüfter anhand der zuletzt gemessenen Temperatur"""
+        self.fan_status = self._control_fan(self.temperature)
+        self.fan_duty = self.fan_controller.duty if self.fan_controller else 0
+
+    def _build_sample(self):
+        """Fasst den aktuellen Stand zu einem Datensatz zusammen"""
+        self.sample_seq += 1
+        return SensorSample(
+            seq=self.sample_seq,
+            temperature=self.temperature,
+            humidity=self.humidity,
+            rgb=self.rgb,
+            fan_status=self.fan_status,
+            fan_duty=self.fan_duty,
+        )
 
-                if self.tcp_server:
-                    self.tcp_server.update_color(rgb)
+    async def _publish_task(self):
+        """Veröffentlicht den aktuellen Stand über TCP und OPC UA"""
+        sample = self._build_sample()
 
-                self.logger.info(
-                    f"Werte - Temp: {temperature}°C, Humidity: {humidity}%, "
-                    f"RGB: {rgb}, Lüfter: {'AN' if fan_status else 'AUS'}"
-                )
+        # Zuerst in die Outbox, damit nachliefernde Clients den Wert nicht verpassen
+        if self.outbox:
+            try:
+                await asyncio.to_thread(self.outbox.append, sample)
+            except Exception as e:
+                self.logger.error(f"Fehler beim Speichern in der Outbox: {e}")
 
-                await self.led_blink_task()
+        if self.tcp_server:
+            self.tcp_server.update_sample(sample)
 
-                if self.opcua_server:
-                    self.opcua_server.update_values(temperature, humidity, rgb, fan_status)
+        self.logger.info(
+            f"Werte - Temp: {self.temperature}°C, Humidity: {self.humidity}%, "
+            f"RGB: {self.rgb}, Lüfter: {'AN' if self.fan_status else 'AUS'}"
+        )
 
-                await asyncio.sleep(SENSOR_READ_INTERVAL)
+        if self.opcua_server:
+            self.opcua_server.update_values(sample.temperature, sample.humidity, sample.rgb,
+                                            sample.fan_status, timestamp=sample.timestamp)
 
+        if self.recorder:
+            try:
+                await asyncio.to_thread(self.recorder.append, sample)
             except Exception as e:
-                self.logger.error(f"Fehler in der Hauptschleife: {e}", exc_info=True)
-                await asyncio.sleep(1)
+                self.logger.error(f"Fehler beim Aufzeichnen der Messwerte: {e}")
 
     def _read_temperature_sensor(self):
         """Liest Temperatur- und Feuchtigkeitswerte"""
@@ -234,12 +381,30 @@ class SensorServer:
         except Exception as e:
             self.logger.error(f"Fehler beim Stoppen des OPC UA-Servers: {e}")
 
+        try:
+            if self.outbox:
+                self.outbox.close()
+        except Exception as e:
+            self.logger.error(f"Fehler beim Schließen der Outbox: {e}")
+
+        try:
+            if self.recorder:
+                self.recorder.close()
+        except Exception as e:
+            self.logger.error(f"Fehler beim Schließen des Telemetrie-Rekorders: {e}")
+
         try:
             if self.image_processor:
                 self.image_processor.close()
         except Exception as e:
             self.logger.error(f"Fehler beim Schließen der Bildverarbeitung: {e}")
 
+        try:
+            if self.temp_sensor:
+                self.temp_sensor.cleanup()
+        except Exception as e:
+            self.logger.error(f"Fehler beim Aufräumen des Temperatursensors: {e}")
+
         try:
             if self.led_controller:
                 self.led_controller.cleanup()
@@ -253,7 +418,9 @@ class SensorServer:
             self.logger.error(f"Fehler beim Aufräumen der Lüftersteuerung: {e}")
 
         try:
-            GPIO.cleanup()
+            if self.led_controller or self.fan_controller or self.temp_sensor:
+                from hardware.gpio import get_gpio
+                get_gpio().cleanup()
         except Exception as e:
             self.logger.error(f"Fehler beim GPIO-Cleanup: {e}")
 
@@ -289,6 +456,7 @@ def main():
     finally:
         if server:
             server.cleanup()
+        shutdown_logging()
 
     return 0
 
@@ -3,19 +3,16 @@ Bildverarbeitung und Kamera-Interface
 """
 
 import logging
-import os
+import threading
 import time
 
 import numpy as np
 
-# Optional imports mit Fallback
-try:
-    from picamera2 import Picamera2
-
-    PICAMERA2_AVAILABLE = True
-except ImportError:
-    PICAMERA2_AVAILABLE = False
+from config import (CAMERA_CAPTURE_MODE, CAMERA_PREVIEW_SIZE, CAMERA_RING_SIZE, CAMERA_ROI,
+                    CAMERA_SAMPLE_STEP, CAMERA_STREAMING)
+from hardware.camera import create_camera, is_simulated, map_request
 
+# Optional imports mit Fallback
 try:
     from PIL import Image
 
@@ -27,28 +24,54 @@ except ImportError:
 class ImageProcessor:
     """
     Klasse zur Erfassung von RGB-Farbwerten und Farberkennung:
-    1) picamera2 (falls verfügbar)
-    2) Fallback: Simulationsmodus
+    1) picamera2 bzw. simulierte Kamera (siehe hardware.camera)
+    2) Fallback: Simulationsmodus mit zufälligen Werten
+
+    Im Modus "preview" wird ein Stream mit niedriger Auflösung genutzt, optional
+    begrenzt auf eine Region of Interest (ROI).
+
+    Im Streaming-Modus füllt ein Hintergrund-Thread einen vorab angelegten
+    Ringpuffer mit den Farbmittelwerten der letzten Bilder, get_rgb_values()
+    greift dann nicht mehr selbst auf die Kamera zu.
     """
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, capture_mode=CAMERA_CAPTURE_MODE, roi=CAMERA_ROI,
+                 sample_step=CAMERA_SAMPLE_STEP, streaming=CAMERA_STREAMING,
+                 ring_size=CAMERA_RING_SIZE):
         self.logger = logger or logging.getLogger(__name__)
         self.camera = None
         self.using_picamera2 = False
         self.simulation_mode = False
 
+        self.capture_mode = capture_mode
+        self.roi = roi
+        self.sample_step = max(1, int(sample_step))
+        self._roi_cache = (None, None)  # (Bildgröße, Slices)
+
+        # Zeitmessung der letzten Erfassung in Millisekunden
+        self.last_capture_ms = 0.0
+        self.last_extract_ms = 0.0
+
+        # Ringpuffer für den Streaming-Modus (einmalig angelegt)
+        self.streaming = streaming
+        self._ring = np.zeros((max(1, int(ring_size)), 3), dtype=np.float32)
+        self._ring_times = np.zeros(len(self._ring), dtype=np.float64)
+        self._ring_index = 0
+        self._ring_count = 0
+        self._ring_lock = threading.Lock()
+        self._stream_thread = None
+        self._stop_event = threading.Event()
+
         self._check_camera_availability()
         self._initialize_camera()
 
     def _check_camera_availability(self):
-        """Prüft, ob eine Kamera verfügbar ist"""
-        if not os.path.exists("/dev/video0"):
-            self.logger.warning("Keine Kamera unter /dev/video0 gefunden – Simulationsmodus aktiviert.")
-            self.simulation_mode = True
-            return
-
-        if not PICAMERA2_AVAILABLE:
-            self.logger.warning("picamera2 nicht verfügbar")
+        """Prüft, ob eine (echte oder simulierte) Kamera verfügbar ist"""
+        try:
+            if is_simulated():
+                self.logger.info("Keine Kamera unter /dev/video0 oder picamera2 fehlt – simulierte Kamera wird verwendet.")
+        except RuntimeError as e:
+            self.logger.warning(f"{e} – Simulationsmodus aktiviert.")
             self.simulation_mode = True
 
     def _initialize_camera(self):
@@ -57,20 +80,31 @@ class ImageProcessor:
             self.logger.info("Bildverarbeitung im Simulationsmodus gestartet")
             return
 
-        if PICAMERA2_AVAILABLE:
-            try:
-                self.camera = Picamera2()
-                config = self.camera.create_still_configuration()
-                self.camera.configure(config)
-                self.camera.start()
-                time.sleep(1)  # Kamera stabilisieren lassen
-                self.using_picamera2 = True
-                self.logger.info("picamera2 erfolgreich initialisiert und gestartet")
-            except Exception as e:
-                self.logger.error(f"Probleme mit picamera2: {e}")
-                self.camera = None
-                self.simulation_mode = True
-                self.logger.warning("Fallback auf Simulationsmodus")
+        try:
+            self.camera = create_camera()
+            self.camera.configure(self._create_camera_config())
+            self.camera.start()
+            time.sleep(1)  # Kamera stabilisieren lassen
+            self.using_picamera2 = True
+            self.logger.info(f"Kamera erfolgreich initialisiert und gestartet (Modus: {self.capture_mode})")
+
+            if self.streaming:
+                self._start_streaming()
+        except Exception as e:
+            self.logger.error(f"Probleme mit der Kamera: {e}")
+            self.camera = None
+            self.simulation_mode = True
+            self.logger.warning("Fallback auf Simulationsmodus")
+
+    def _create_camera_config(self):
+        """Erstellt die Kamerakonfiguration passend zum Erfassungsmodus"""
+        if self.capture_mode == "preview":
+            # "BGR888" liefert bei picamera2 Pixel in der Reihenfolge [R, G, B],
+            # genau wie die Standard-Still-Konfiguration
+            return self.camera.create_preview_configuration(
+                main={"size": tuple(CAMERA_PREVIEW_SIZE), "format": "BGR888"}
+            )
+        return self.camera.create_still_configuration()
 
     def get_rgb_values(self):
         """
@@ -81,6 +115,9 @@ class ImageProcessor:
             if self.simulation_mode:
                 return self._get_simulated_rgb()
 
+            if self._stream_thread:
+                return self._get_streamed_rgb()
+
             if self.using_picamera2 and self.camera:
                 return self._get_camera_rgb()
 
@@ -102,18 +139,135 @@ class ImageProcessor:
     def _get_camera_rgb(self):
         """Extrahiert RGB-Mittelwerte aus dem Kamerabild"""
         try:
+            start = time.perf_counter()
             frame = self.camera.capture_array()
-            r = int(np.mean(frame[:, :, 0]))
-            g = int(np.mean(frame[:, :, 1]))
-            b = int(np.mean(frame[:, :, 2]))
-            self.logger.debug(f"Kamera RGB-Werte: ({r}, {g}, {b})")
+            captured = time.perf_counter()
+            r, g, b = self._extract_rgb(frame)
+            done = time.perf_counter()
+
+            self.last_capture_ms = (captured - start) * 1000
+            self.last_extract_ms = (done - captured) * 1000
+            self.logger.debug(f"Kamera RGB-Werte: ({r}, {g}, {b}) - Aufnahme {self.last_capture_ms:.1f} ms, "
+                              f"Auswertung {self.last_extract_ms:.1f} ms")
             return r, g, b
         except Exception as e:
             self.logger.error(f"Fehler beim Lesen der Kamera: {e}")
             raise
 
+    def _extract_rgb(self, frame):
+        """Gibt die RGB-Mittelwerte der ROI als ganze Zahlen zurück"""
+        means = self._extract_means(frame)
+        return int(means[0]), int(means[1]), int(means[2])
+
+    def _extract_means(self, frame):
+        """
+        Berechnet die Mittelwerte aller drei Kanäle in einer einzigen
+        vektorisierten Reduktion über die ROI (ohne Kopie des Bildes).
+        """
+        region = frame[self._get_roi_slices(frame.shape)]
+        return region[..., :3].mean(axis=(0, 1))
+
+    def _get_roi_slices(self, shape):
+        """Liefert die (zwischengespeicherten) Slices für ROI und Schrittweite"""
+        size = shape[:2]
+        cached_size, slices = self._roi_cache
+        if cached_size == size:
+            return slices
+
+        height, width = size
+        if self.roi:
+            rx, ry, rw, rh = self.roi
+            x0 = min(max(int(rx * width), 0), width - 1)
+            y0 = min(max(int(ry * height), 0), height - 1)
+            x1 = max(min(int((rx + rw) * width), width), x0 + 1)
+            y1 = max(min(int((ry + rh) * height), height), y0 + 1)
+        else:
+            x0, y0, x1, y1 = 0, 0, width, height
+
+        step = self.sample_step
+        slices = (slice(y0, y1, step), slice(x0, x1, step))
+        self._roi_cache = (size, slices)
+        return slices
+
+    def _start_streaming(self):
+        """Startet den Hintergrund-Thread für die fortlaufende Bilderfassung"""
+        self._stop_event.clear()
+        self._stream_thread = threading.Thread(target=self._stream_loop, name="CameraStream", daemon=True)
+        self._stream_thread.start()
+        self.logger.info(f"Kamera-Streaming gestartet (Ringpuffer: {len(self._ring)} Bilder)")
+
+    def _stream_loop(self):
+        """
+        Erfasst fortlaufend Bilder. Die Auswertung erfolgt direkt auf dem
+        Kamerapuffer (MappedArray), es wird kein neues Bild-Array angelegt.
+        """
+        width, height = self.camera.camera_configuration()["main"]["size"]
+
+        while not self._stop_event.is_set():
+            try:
+                start = time.perf_counter()
+                request = self.camera.capture_request()
+                captured = time.perf_counter()
+                try:
+                    with map_request(request, "main") as array:
+                        means = self._extract_means(array[:height, :width])
+                finally:
+                    request.release()
+                done = time.perf_counter()
+
+                self.last_capture_ms = (captured - start) * 1000
+                self.last_extract_ms = (done - captured) * 1000
+                self._push_sample(means)
+            except Exception as e:
+                self.logger.error(f"Fehler im Kamera-Streaming: {e}")
+                self._stop_event.wait(1)
+
+    def _push_sample(self, means):
+        """Schreibt einen Farbmittelwert in den Ringpuffer"""
+        with self._ring_lock:
+            self._ring[self._ring_index] = means
+            self._ring_times[self._ring_index] = time.time()
+            self._ring_index = (self._ring_index + 1) % len(self._ring)
+            self._ring_count = min(self._ring_count + 1, len(self._ring))
+
+    def _get_streamed_rgb(self):
+        """Gibt den neuesten Wert aus dem Ringpuffer zurück"""
+        with self._ring_lock:
+            if self._ring_count == 0:
+                return 0, 0, 0
+            r, g, b = self._ring[self._ring_index - 1]
+        return int(r), int(g), int(b)
+
+    def get_average_rgb(self, frames=None):
+        """
+        Gibt den zeitlichen Mittelwert über die letzten `frames` Bilder zurück.
+        Ohne Streaming wird ein einzelnes Bild ausgewertet.
+        """
+        if not self._stream_thread:
+            return self.get_rgb_values()
+
+        with self._ring_lock:
+            count = self._ring_count if frames is None else max(1, min(int(frames), self._ring_count))
+            if count == 0:
+                return 0, 0, 0
+            indices = (self._ring_index - 1 - np.arange(count)) % len(self._ring)
+            r, g, b = self._ring[indices].mean(axis=0)
+        return int(r), int(g), int(b)
+
+    def get_timing(self):
+        """Gibt die Dauer der letzten Aufnahme und Auswertung in Millisekunden zurück"""
+        return {
+            "capture_ms": self.last_capture_ms,
+            "extract_ms": self.last_extract_ms,
+        }
+
     def close(self):
         """Schließt die Kamera oder gibt sie frei."""
+        if self._stream_thread:
+            self._stop_event.set()
+            self._stream_thread.join(timeout=2)
+            self._stream_thread = None
+
         if self.using_picamera2 and self.camera:
             try:
                 self.camera.close()
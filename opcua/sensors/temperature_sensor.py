@@ -3,87 +3,177 @@ DHT22 Temperatursensor Klasse
 """
 
 import logging
+import random
+import statistics
+import threading
 import time
+from collections import deque
 
-import RPi.GPIO as GPIO  # Tippfehler von GIOP korrigiert
-import adafruit_dht
-import board
+from config import (DHT_MAX_AGE, DHT_MAX_BACKOFF, DHT_MEDIAN_WINDOW, DHT_OUTLIER_LIMITS, DHT_PIN,
+                    TEMPERATURE_READ_INTERVAL)
+from hardware.dht import DHT22_MIN_INTERVAL, create_dht22
 
 
 class TemperatureHumiditySensor:
     """
     Klasse zur Ansteuerung des DHT22-Sensors
-    über die Bibliothek adafruit_dht (inkl. Blinka).
+    über die Bibliothek adafruit_dht (inkl. Blinka) bzw. dessen Simulation.
+
+    Ein eigener Thread liest den Sensor im Abstand von `interval` Sekunden
+    (mindestens 2 s, schneller misst der DHT22 nicht). Nach Fehlversuchen wird
+    der Abstand bis DHT_MAX_BACKOFF verdoppelt. Ausreißer, die weiter als
+    DHT_OUTLIER_LIMITS vom Median der letzten Messungen abweichen, werden
+    verworfen. read_sensor() blockiert nie und liefert den letzten gültigen Wert.
     """
 
-    def __init__(self, use_dummy=False, logger=None):
+    def __init__(self, use_dummy=False, logger=None, interval=TEMPERATURE_READ_INTERVAL):
         """
         :param use_dummy: Wenn True, werden Dummy-Werte zurückgegeben (z.B. für Tests ohne Hardware).
         :param logger: Optionaler Logger.
+        :param interval: Abstand zwischen zwei Messungen in Sekunden.
         """
         self.logger = logger or logging.getLogger(__name__)
         self.use_dummy = use_dummy
         self.dht_device = None
+        self.interval = max(interval, DHT22_MIN_INTERVAL)
+
+        # Letzter gültiger Messwert (Temperatur, Feuchte, Zeitpunkt) und Statistik
+        self._last_good = None
+        self._window = deque(maxlen=max(1, DHT_MEDIAN_WINDOW))
+        self._lock = threading.Lock()
+        self.stats = {"reads": 0, "successes": 0, "failures": 0, "outliers": 0}
+        self._consecutive_failures = 0
+
+        self._stop_event = threading.Event()
+        self._thread = None
 
         if self.use_dummy:
             self.logger.info("Dummy-Modus aktiviert: Sensorwerte werden simuliert.")
-            return
+        else:
+            try:
+                self.dht_device = create_dht22(DHT_PIN)
+                self.logger.info(f"DHT22-Sensor erfolgreich initialisiert an board.D{DHT_PIN}")
+            except Exception as e:
+                self.logger.error(f"Fehler bei der DHT22-Initialisierung: {e}")
+                self.dht_device = None
 
-        try:
-            # Verwende Board-Pin D4 (GPIO4)
-            self.dht_device = adafruit_dht.DHT22(board.D4, use_pulseio=False)
-            self.logger.info("DHT22-Sensor erfolgreich initialisiert an board.D4")
-        except Exception as e:
-            self.logger.error(f"Fehler bei der DHT22-Initialisierung: {e}")
-            self.dht_device = None
-
-    def read_sensor(self, max_attempts=5, delay=1.0):
-        """
-        Temperatur- und Feuchtigkeitswert vom DHT22-Sensor abfragen.
-        Gibt (None, None) zurück, falls kein Wert gelesen werden kann.
-        :param max_attempts: Anzahl der Leseversuche.
-        :param delay: Pause zwischen Versuchen (Sekunden).
-        """
+        self._thread = threading.Thread(target=self._read_loop, name="DHT22Reader", daemon=True)
+        self._thread.start()
+
+    def _read_loop(self):
+        """Liest den Sensor fortlaufend; nach Fehlversuchen mit wachsendem Abstand"""
+        while not self._stop_event.is_set():
+            if self._read_once():
+                self._consecutive_failures = 0
+                delay = self.interval
+            else:
+                self._consecutive_failures += 1
+                delay = min(self.interval * 2 ** (self._consecutive_failures - 1), DHT_MAX_BACKOFF)
+            self._stop_event.wait(delay)
+
+    def _read_device(self):
+        """Ein Lesevorgang; gibt (Temperatur, Feuchte) oder (None, None) zurück"""
         if self.use_dummy or not self.dht_device:
-            self.logger.debug("Dummy-Werte werden generiert.")
-            import random
             return 25.0 + random.uniform(-2, 2), 50.0 + random.uniform(-5, 5)
+        return self.dht_device.temperature, self.dht_device.humidity
 
-        for attempt in range(1, max_attempts + 1):
-            try:
-                temperature = self.dht_device.temperature
-                humidity = self.dht_device.humidity
+    def _read_once(self):
+        """Liest einen Messwert und übernimmt ihn, wenn er kein Ausreißer ist"""
+        self.stats["reads"] += 1
+        try:
+            temperature, humidity = self._read_device()
+        except RuntimeError as err:
+            # Lesefehler sind beim DHT22 normal (Timing, Prüfsumme)
+            self.stats["failures"] += 1
+            self.logger.debug(f"Temporärer DHT22-Lesefehler: {err}")
+            return False
+        except Exception as err:
+            self.stats["failures"] += 1
+            self.logger.error(f"Allgemeiner Fehler beim Lesen des DHT22: {err}")
+            return False
+
+        if temperature is None or humidity is None:
+            self.stats["failures"] += 1
+            self.logger.debug("DHT22: Keine gültigen Werte erhalten.")
+            return False
 
-                if temperature is not None and humidity is not None:
-                    self.logger.debug(f"DHT22 gelesen: Temp={temperature:.2f}°C, Feuchte={humidity:.2f}%")
-                    return temperature, humidity
-                else:
-                    self.logger.debug(f"DHT22 Versuch {attempt}: Keine gültigen Werte erhalten.")
+        # Der Median stammt aus den vorherigen Messungen, damit der verdächtige
+        # Wert sich nicht selbst bestätigt. Verworfene Werte landen trotzdem im
+        # Fenster: bei einem echten Temperatursprung kippt so nach wenigen
+        # Messungen der Median und der neue Wert wird übernommen.
+        outlier = self._is_outlier(temperature, humidity)
+        self._window.append((temperature, humidity))
+        if outlier:
+            self.stats["outliers"] += 1
+            self.logger.debug(f"DHT22-Ausreißer verworfen: Temp={temperature:.2f}°C, Feuchte={humidity:.2f}%")
+            return True
 
-            except RuntimeError as err:
-                self.logger.debug(f"Temporärer DHT22-Lesefehler (Versuch {attempt}): {err}")
-                time.sleep(delay)
-            except Exception as err:
-                self.logger.error(f"Allgemeiner Fehler beim Lesen des DHT22 (Versuch {attempt}): {err}")
-                break
+        self.stats["successes"] += 1
+        with self._lock:
+            self._last_good = (temperature, humidity, time.monotonic())
+        self.logger.debug(f"DHT22 gelesen: Temp={temperature:.2f}°C, Feuchte={humidity:.2f}%")
+        return True
 
-        self.logger.warning("DHT22: Alle Leseversuche fehlgeschlagen.")
-        return None, None
+    def _is_outlier(self, temperature, humidity):
+        """Vergleicht mit dem Median der bisherigen Messungen im Fenster"""
+        if not self._window:
+            return False
+
+        max_temperature_diff, max_humidity_diff = DHT_OUTLIER_LIMITS
+        median_temperature = statistics.median_low(t for t, _ in self._window)
+        median_humidity = statistics.median_low(h for _, h in self._window)
+        return (abs(temperature - median_temperature) > max_temperature_diff
+                or abs(humidity - median_humidity) > max_humidity_diff)
+
+    def get_reading(self):
+        """
+        Letzter gültiger Messwert mit seinem Alter.
+        :return: (Temperatur, Feuchte, Alter in Sekunden) oder (None, None, None).
+        """
+        with self._lock:
+            last_good = self._last_good
+
+        if last_good is None:
+            return None, None, None
+        temperature, humidity, measured_at = last_good
+        return temperature, humidity, time.monotonic() - measured_at
+
+    def read_sensor(self):
+        """
+        Temperatur- und Feuchtigkeitswert, ohne auf den Sensor zu warten.
+        Gibt (None, None) zurück, falls noch kein Wert vorliegt oder der letzte
+        gültige Wert älter als DHT_MAX_AGE Sekunden ist.
+        """
+        temperature, humidity, age = self.get_reading()
+        if age is None or age > DHT_MAX_AGE:
+            return None, None
+        return temperature, humidity
+
+    def get_stats(self):
+        """Lesestatistik mit Erfolgsquote"""
+        stats = dict(self.stats)
+        stats["success_rate"] = stats["successes"] / stats["reads"] if stats["reads"] else 0.0
+        stats["age"] = self.get_reading()[2]
+        return stats
 
     def cleanup(self):
         """
-        Ressourcencleanup für den Sensor und GPIO.
+        Ressourcencleanup für den Sensor. Die GPIO-Pins gibt der SensorServer
+        zum Schluss gemeinsam frei, nachdem LED und Lüfter abgeschaltet sind.
         """
-        self.logger.info("Cleanup: DHT22 und GPIO werden freigegeben.")
+        self.logger.info("Cleanup: DHT22 wird freigegeben.")
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join(timeout=2)
+            self._thread = None
+
+        stats = self.get_stats()
+        self.logger.info(f"DHT22-Statistik: {stats['reads']} Lesevorgänge, {stats['success_rate']:.0%} erfolgreich, "
+                         f"{stats['failures']} Fehler, {stats['outliers']} Ausreißer verworfen")
+
         if self.dht_device:
             try:
                 self.dht_device.exit()
                 self.logger.info("DHT22-Sensor erfolgreich beendet.")
             except Exception as e:
                 self.logger.error(f"Fehler beim Beenden des DHT22-Sensors: {e}")
-
-        try:
-            GPIO.cleanup()
-            self.logger.info("GPIO erfolgreich freigegeben.")
-        except Exception as e:
-            self.logger.error(f"Fehler beim GPIO-Cleanup: {e}")
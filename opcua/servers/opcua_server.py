@@ -1,8 +1,18 @@
+import json
 import logging
 import os
+from datetime import datetime, timedelta
 
 from opcua import Server, ua
 from opcua.crypto import security_policies, uacrypto
+from opcua.server.history_sql import HistorySQLite
+
+from config import OPCUA_DEADBANDS, OPCUA_HISTORY_MAX_RECORDS, OPCUA_HISTORY_RETENTION_HOURS, OUTBOX_BATCH_SIZE
+
+NAMESPACE_URI = "http://raspberry-mrt.local/sensors"
+
+# Rundungsfehler beim Vergleich mit dem Totband (0.1-Schritte des DHT22 sind nicht exakt darstellbar)
+DEADBAND_TOLERANCE = 1e-9
 
 
 class OPCUAServer:
@@ -10,15 +20,33 @@ class OPCUAServer:
     OPC UA Server Klasse für den Raspberry Pi.
     Stellt Temperatur-, Feuchtigkeits- und Farbwerte
     über das OPC UA-Protokoll zur Verfügung.
+
+    Werte werden nur veröffentlicht, wenn sie ihr Totband verlassen. Alle
+    geänderten Variablen eines Zyklus werden in einem einzigen Write geschrieben.
+
+    Ist history_path gesetzt, werden Temperature, Humidity, Color und FanStatus
+    historisiert und können per HistoryRead abgefragt werden. Die Historie liegt
+    in einer SQLite-Datei, begrenzt auf Anzahl und Alter der Einträge.
+
+    Alle Knoten haben feste String-NodeIds (z.B. ns=2;s=Sensors.Temperature).
+    Die Variable Sensors.Manifest und die Methode Sensors.GetNodeMap liefern die
+    vollständige Zuordnung als JSON, sodass Clients ohne Browse auskommen.
+
+    Die Methode Sensors.GetBacklog(afterSeq, maxCount) liefert die Messwerte
+    nach afterSeq aus der Outbox als JSON, damit ein Client nach einer
+    Unterbrechung ohne Lücke fortsetzen kann. Ändert sich die mitgelieferte
+    Epoche, wurde die Outbox neu angelegt und die Sequenz beginnt wieder bei 1.
     """
 
     def __init__(self, endpoint, name, cert_path, key_path,
-                 logger=None):
+                 logger=None, history_path=None, outbox=None):
         self.server = Server()
         self.endpoint = endpoint
         self.name = name
         self.cert_path = cert_path
         self.key_path = key_path
+        self.history_path = history_path
+        self.outbox = outbox
 
         self.logger = logger or logging.getLogger(__name__)
 
@@ -27,6 +55,11 @@ class OPCUAServer:
         self.color_var = None
         self.fan_status_var = None
         self.fan_control_var = None
+        self.manifest_var = None
+        self.node_map = {}
+
+        self.deadbands = dict(OPCUA_DEADBANDS)
+        self._last_published = {}
 
         self._setup_server()
 
@@ -39,6 +72,7 @@ class OPCUAServer:
             self._setup_certificates()  # This will handle loading server's own cert/key
             self._setup_security()  # This will only set security policies now
             self._create_variables()
+            self._setup_history_storage()
 
             self.logger.info("OPC UA Server erfolgreich konfiguriert")
         except Exception as e:
@@ -77,63 +111,209 @@ class OPCUAServer:
         self.logger.info("Sicherheitsrichtlinien konfiguriert.")
 
     def _create_variables(self):
-        """Erstellt die OPC UA Variablen"""
-        idx = self.server.register_namespace("http://raspberry-mrt.local/sensors")
+        """Erstellt die OPC UA Variablen mit festen String-NodeIds"""
+        idx = self.server.register_namespace(NAMESPACE_URI)
         objects = self.server.get_objects_node()
-        self.sensors = objects.add_object(idx, "Sensors")
+        self.sensors = objects.add_object(ua.NodeId("Sensors", idx), f"{idx}:Sensors")
 
-        self.temp_var = self.sensors.add_variable(idx, "Temperature", 0.0)
-        self.humidity_var = self.sensors.add_variable(idx, "Humidity", 0.0)
-        self.color_var = self.sensors.add_variable(idx, "Color", [0, 0, 0])
-        self.fan_status_var = self.sensors.add_variable(idx, "FanStatus", False)
+        historizing = bool(self.history_path)
+        self.temp_var = self._add_variable(idx, "Temperature", 0.0, ua.VariantType.Double, historizing=historizing)
+        self.humidity_var = self._add_variable(idx, "Humidity", 0.0, ua.VariantType.Double, historizing=historizing)
+        self.color_var = self._add_variable(idx, "Color", [0, 0, 0], ua.VariantType.Int64, historizing=historizing)
+        self.fan_status_var = self._add_variable(idx, "FanStatus", False, ua.VariantType.Boolean,
+                                                 historizing=historizing)
 
-        self.fan_control_var = self.sensors.add_variable(idx, "FanControl", False)
+        self.fan_control_var = self._add_variable(idx, "FanControl", False, ua.VariantType.Boolean, writable=True)
         self.fan_control_var.set_writable()
 
+        get_node_map = self.sensors.add_method(ua.NodeId("Sensors.GetNodeMap", idx), f"{idx}:GetNodeMap",
+                                               self._get_node_map, [], [ua.VariantType.String])
+        get_backlog = self.sensors.add_method(ua.NodeId("Sensors.GetBacklog", idx), f"{idx}:GetBacklog",
+                                              self._get_backlog, [ua.VariantType.UInt32, ua.VariantType.UInt32],
+                                              [ua.VariantType.String])
+
+        manifest = json.dumps({
+            "namespaceUri": NAMESPACE_URI,
+            "namespaceIndex": idx,
+            "objectId": self.sensors.nodeid.to_string(),
+            "variables": self.node_map,
+            "methods": {
+                "GetNodeMap": {"nodeId": get_node_map.nodeid.to_string()},
+                "GetBacklog": {"nodeId": get_backlog.nodeid.to_string()},
+            },
+        })
+        self.manifest_var = self.sensors.add_variable(ua.NodeId("Sensors.Manifest", idx), f"{idx}:Manifest",
+                                                      manifest, ua.VariantType.String)
+
         self.logger.info("OPC UA Server-Variablen erstellt")
 
+    def _add_variable(self, idx, name, value, variant_type, writable=False, historizing=False):
+        """Legt eine Variable mit der NodeId ns=<idx>;s=Sensors.<name> an und trägt sie ins Manifest ein"""
+        node = self.sensors.add_variable(ua.NodeId(f"Sensors.{name}", idx), f"{idx}:{name}", value, variant_type)
+        self.node_map[name] = {
+            "nodeId": node.nodeid.to_string(),
+            "dataType": variant_type.name,
+            "writable": writable,
+            "historizing": historizing,
+        }
+        return node
+
+    def _get_node_map(self, parent):
+        """OPC UA Methode: gibt die Zuordnung aller Variablen als JSON zurück"""
+        return [ua.Variant(self.manifest_var.get_value(), ua.VariantType.String)]
+
+    def _get_backlog(self, parent, after_seq, max_count):
+        """
+        OPC UA Methode: Messwerte mit einer Sequenznummer größer als afterSeq
+        (höchstens maxCount, 0 = Standard) als JSON {"samples": [...], "epoch", "firstSeq", "lastSeq"}.
+        """
+        if self.outbox is None:
+            return ua.StatusCode(ua.StatusCodes.BadNotSupported)
+
+        limit = max_count.Value or OUTBOX_BATCH_SIZE
+        samples = self.outbox.read_after(after_seq.Value, min(limit, OUTBOX_BATCH_SIZE))
+        backlog = json.dumps({
+            "samples": [sample.to_dict() for sample in samples],
+            "epoch": self.outbox.epoch,
+            "firstSeq": self.outbox.first_seq(),
+            "lastSeq": self.outbox.last_seq(),
+        })
+        return [ua.Variant(backlog, ua.VariantType.String)]
+
+    def _setup_history_storage(self):
+        """Hinterlegt die SQLite-Datei als Speicher für die OPC UA Historie"""
+        if not self.history_path:
+            return
+
+        history_dir = os.path.dirname(self.history_path)
+        if history_dir:
+            os.makedirs(history_dir, exist_ok=True)
+
+        self.server.iserver.history_manager.set_storage(HistorySQLite(self.history_path))
+        self.logger.info(f"OPC UA Historie wird gespeichert in {self.history_path}")
+
+    def _enable_history(self):
+        """Aktiviert die Historisierung der Messwert-Variablen (nach dem Serverstart)"""
+        if not self.history_path:
+            return
+
+        period = timedelta(hours=OPCUA_HISTORY_RETENTION_HOURS)
+        for node in (self.temp_var, self.humidity_var, self.color_var, self.fan_status_var):
+            if node:
+                # Historizing und das HistoryRead-Bit zeigen generischen Clients, dass es eine Historie gibt
+                node.set_attribute(ua.AttributeIds.Historizing, ua.DataValue(True))
+                node.set_attr_bit(ua.AttributeIds.AccessLevel, ua.AccessLevel.HistoryRead)
+                node.set_attr_bit(ua.AttributeIds.UserAccessLevel, ua.AccessLevel.HistoryRead)
+                self.server.historize_node_data_change(node, period=period, count=OPCUA_HISTORY_MAX_RECORDS)
+
+        self.logger.info(f"OPC UA Historie aktiviert (max. {OPCUA_HISTORY_MAX_RECORDS} Einträge, "
+                         f"{OPCUA_HISTORY_RETENTION_HOURS} h pro Variable)")
+
     def start(self):
         """Startet den OPC UA Server."""
         try:
             self.server.start()
             self.logger.info(f"OPC UA Server gestartet auf {self.endpoint}")
-            return True
         except Exception as e:
             self.logger.error(f"Fehler beim Starten des OPC UA Servers: {e}", exc_info=True)
             return False
 
-    def update_values(self, temperature, humidity, color, fan_status):
+        try:
+            self._enable_history()
+        except Exception as e:
+            self.logger.error(f"Fehler beim Aktivieren der OPC UA Historie: {e}", exc_info=True)
+
+        return True
+
+    def update_values(self, temperature, humidity, color, fan_status, timestamp=None):
         """
         Aktualisiert die Variablen des OPC UA Servers
         mit neuen Werten für Temperatur, Feuchtigkeit, Farbe und Lüfterstatus.
+        :param timestamp: Zeitpunkt der Messung (Unix-Zeit), wird als SourceTimestamp gesetzt.
         """
         try:
-            updates_made = []
-
-            if temperature is not None and self.temp_var:
-                self.temp_var.set_value(float(temperature))
-                updates_made.append(f"Temp: {temperature}")
+            candidates = (
+                ("Temperature", self.temp_var,
+                 None if temperature is None else float(temperature), ua.VariantType.Double),
+                ("Humidity", self.humidity_var,
+                 None if humidity is None else float(humidity), ua.VariantType.Double),
+                ("Color", self.color_var,
+                 None if color is None else [int(c) for c in color], ua.VariantType.Int64),
+                ("FanStatus", self.fan_status_var,
+                 None if fan_status is None else bool(fan_status), ua.VariantType.Boolean),
+            )
 
-            if humidity is not None and self.humidity_var:
-                self.humidity_var.set_value(float(humidity))
-                updates_made.append(f"Humidity: {humidity}")
+            changed = [
+                (name, node, value, variant_type)
+                for name, node, value, variant_type in candidates
+                if value is not None and node and self._exceeds_deadband(name, value)
+            ]
+            if not changed:
+                return True
 
-            if color is not None and self.color_var:
-                self.color_var.set_value(list(color))
-                updates_made.append(f"Color: {color}")
+            source_time = datetime.utcfromtimestamp(timestamp) if timestamp else datetime.utcnow()
+            written = self._write_batch(changed, source_time)
 
-            if fan_status is not None and self.fan_status_var:
-                self.fan_status_var.set_value(bool(fan_status))
-                updates_made.append(f"Fan: {fan_status}")
+            for name, _, value, _ in written:
+                self._last_published[name] = value
 
-            if updates_made:
-                self.logger.debug(f"OPC UA Updates: {', '.join(updates_made)}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("OPC UA Updates: " + ", ".join(f"{name}: {value}" for name, _, value, _ in changed))
 
             return True
         except Exception as e:
             self.logger.error(f"Fehler beim Aktualisieren der OPC UA-Variablen: {e}")
             return False
 
+    def _exceeds_deadband(self, name, value):
+        """Prüft, ob ein Wert das Totband um den zuletzt veröffentlichten Wert verlässt"""
+        last = self._last_published.get(name)
+        if last is None:
+            return True
+
+        absolute, percent = self.deadbands.get(name, (0, 0.0))
+        if isinstance(value, bool):
+            return value != last
+
+        values = value if isinstance(value, list) else [value]
+        lasts = last if isinstance(last, list) else [last]
+        for current, previous in zip(values, lasts):
+            diff = abs(current - previous)
+            if diff == 0:
+                continue
+            if diff > absolute + DEADBAND_TOLERANCE or (
+                    percent and diff > abs(previous) * percent / 100.0 + DEADBAND_TOLERANCE):
+                return True
+        return False
+
+    def _write_batch(self, changed, source_time):
+        """
+        Schreibt alle geänderten Variablen in einem einzigen Write-Aufruf.
+        Gibt die erfolgreich geschriebenen Einträge zurück.
+        """
+        server_time = datetime.utcnow()
+        params = ua.WriteParameters()
+
+        for _, node, value, variant_type in changed:
+            data_value = ua.DataValue(ua.Variant(value, variant_type))
+            data_value.SourceTimestamp = source_time
+            data_value.ServerTimestamp = server_time
+
+            write_value = ua.WriteValue()
+            write_value.NodeId = node.nodeid
+            write_value.AttributeId = ua.AttributeIds.Value
+            write_value.Value = data_value
+            params.NodesToWrite.append(write_value)
+
+        results = self.server.iserver.isession.write(params)
+        written = []
+        for entry, status in zip(changed, results):
+            if status.is_good():
+                written.append(entry)
+            else:
+                self.logger.warning(f"OPC UA Write für {entry[0]} fehlgeschlagen: {status}")
+        return written
+
     def get_fan_control(self):
         """Gibt den aktuellen Wert der Lüftersteuerungsvariable zurück."""
         try:
@@ -2,38 +2,201 @@ import asyncio
 import json
 import logging
 
+from config import TCP_CLIENT_QUEUE_SIZE, TCP_HANDSHAKE_TIMEOUT
+from utils.telemetry import SensorSample
+
+FORMAT_JSON = "JSON"
+FORMAT_BINARY = "BIN"
+
 
 class ColorSensorServer:
-    def __init__(self, host, port, logger=None):
+    """
+    TCP Server, der die Messwerte des SensorServers an verbundene Clients verteilt.
+    Jeder veröffentlichte Datensatz (einer pro SENSOR_READ_INTERVAL, mit eigener
+    Sequenznummer) wird einmal je Format kodiert und in eine begrenzte
+    Sendewarteschlange pro Client gelegt - so entspricht der laufende Strom
+    lückenlos dem, was per RESUME aus der Outbox nachgeliefert wird. Ist die
+    Warteschlange eines langsamen Clients voll, wird die älteste Nachricht verworfen.
+
+    Format-Aushandlung: Sendet der Client direkt nach dem Verbinden die Zeile
+    "BIN", erhält er binäre Datensätze fester Länge (siehe utils.telemetry),
+    bei "JSON" oder ohne Anfrage eine JSON-Zeile pro Datensatz.
+
+    Fortsetzen: Mit "JSON RESUME <seq> [<epoch>]" bzw. "BIN RESUME <seq> [<epoch>]"
+    werden zuerst alle Messwerte nach <seq> aus der Outbox in Blöcken
+    nachgeliefert, danach geht es ohne Lücke und ohne Doppelte mit den laufenden
+    Werten weiter. Passt die Epoche nicht zur Outbox (neu angelegt), wird von
+    vorne geliefert. Im JSON-Format steht vor dem Rückstand die Zeile
+    {"epoch": "..."}, damit der Client die aktuelle Epoche speichern kann.
+    """
+
+    def __init__(self, host, port, logger=None, queue_size=TCP_CLIENT_QUEUE_SIZE, outbox=None):
         self.host = host
         self.port = port
         self.logger = logger or logging.getLogger(__name__)
         self.server = None
-        self.clients = set()
-        self.latest_color = (0, 0, 0)
+        self.clients = {}  # writer -> (Sendewarteschlange, Format)
+        self.latest_sample = SensorSample()
+        self.queue_size = max(1, int(queue_size))
+        self.dropped_messages = 0
+        self.outbox = outbox
+
+        self._loop = None
+        self._changed = None
+        self._payloads = {}
+        self._broadcast_task = None
+
+    @property
+    def latest_color(self):
+        return self.latest_sample.rgb
+
+    def update_sample(self, sample):
+        """Veröffentlicht einen vollständigen Messwert-Datensatz"""
+        self.latest_sample = sample
+        self._payloads = {}
+        self.logger.debug(f"Datensatz {sample.seq} aktualisiert")
+        self._notify()
+
+    def _notify(self):
+        """Weckt den Verteiler-Task (auch aus anderen Threads aufrufbar)"""
+        if self._loop and self._changed:
+            self._loop.call_soon_threadsafe(self._changed.set)
 
-    def update_color(self, rgb_tuple):
-        if not isinstance(rgb_tuple, tuple) or len(rgb_tuple) != 3:
-            self.logger.warning(f"Ungültige Farbwerte übergeben: {rgb_tuple}")
-            return
-        self.latest_color = rgb_tuple
-        self.logger.debug(f"Farbwerte aktualisiert: {self.latest_color}")
+    def _get_payload(self, fmt):
+        """Kodiert den aktuellen Stand einmalig pro Änderung und Format"""
+        payload = self._payloads.get(fmt)
+        if payload is None:
+            if fmt == FORMAT_BINARY:
+                payload = self.latest_sample.to_binary()
+            else:
+                payload = self.latest_sample.to_json_line()
+            self._payloads[fmt] = payload
+        return payload
+
+    def _enqueue(self, queue, payload):
+        """Legt eine Nachricht ab, bei voller Warteschlange wird die älteste verworfen"""
+        if queue.full():
+            queue.get_nowait()
+            self.dropped_messages += 1
+        queue.put_nowait(payload)
+
+    async def _broadcast_loop(self):
+        """Verteilt jede Änderung an die Warteschlangen aller Clients"""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            seq = self.latest_sample.seq
+            for queue, fmt in self.clients.values():
+                self._enqueue(queue, (seq, self._get_payload(fmt)))
+
+    async def _send_to_client(self, writer, queue, sent_seq=None):
+        """
+        Schreibt die Nachrichten eines Clients, unabhängig von allen anderen.
+        Nachrichten bis einschließlich `sent_seq` wurden bereits aus der Outbox gesendet.
+        """
+        while True:
+            seq, payload = await queue.get()
+            if sent_seq is not None and seq <= sent_seq:
+                continue
+            writer.write(payload)
+            await writer.drain()
+
+    async def _send_backlog(self, writer, fmt, after_seq, epoch, addr):
+        """
+        Sendet alle Messwerte nach `after_seq` aus der Outbox, je Block ein Write.
+        Gibt die Sequenznummer des zuletzt gesendeten Messwerts zurück (None, wenn nichts fehlte).
+        """
+        if fmt == FORMAT_JSON:
+            writer.write((json.dumps({"epoch": self.outbox.epoch}) + "\n").encode())
+        if epoch is not None and epoch != self.outbox.epoch:
+            self.logger.warning(f"Client {addr}: Epoche {epoch} unbekannt, Outbox wird von vorne geliefert")
+            after_seq = 0
+
+        first_seq = await asyncio.to_thread(self.outbox.first_seq)
+        if first_seq and after_seq + 1 < first_seq:
+            self.logger.warning(f"Client {addr}: Messwerte {after_seq + 1}..{first_seq - 1} "
+                                f"sind nicht mehr in der Outbox")
+
+        encode = SensorSample.to_binary if fmt == FORMAT_BINARY else SensorSample.to_json_line
+        sent_seq = None
+        count = 0
+        while True:
+            samples = await asyncio.to_thread(self.outbox.read_after, after_seq)
+            if not samples:
+                break
+            writer.write(b"".join(encode(sample) for sample in samples))
+            await writer.drain()
+            after_seq = sent_seq = samples[-1].seq
+            count += len(samples)
+
+        self.logger.info(f"Client {addr}: {count} Messwerte aus der Outbox nachgeliefert")
+        return sent_seq
+
+    async def _read_from_client(self, reader, addr):
+        while True:
+            data = await reader.read(100)
+            if not data:
+                break
+            self.logger.info(f"Empfangen von {addr}: {data}")
+
+    async def _negotiate(self, reader):
+        """
+        Wartet kurz auf die Anfrage des Clients ("<Format> [RESUME <seq> [<epoch>]]").
+        Gibt (Format, Sequenznummer zum Fortsetzen oder None, Epoche oder None)
+        zurück, Standard ist JSON.
+        """
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=TCP_HANDSHAKE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return FORMAT_JSON, None, None
+
+        request = line.decode(errors="ignore").strip().split()
+        fmt = FORMAT_BINARY if request and request[0].upper() == FORMAT_BINARY else FORMAT_JSON
+
+        resume_seq = None
+        epoch = None
+        if len(request) in (3, 4) and request[1].upper() == "RESUME":
+            try:
+                resume_seq = max(0, int(request[2]))
+            except ValueError:
+                self.logger.warning(f"Ungültige Sequenznummer in der Anfrage: {request[2]}")
+            if len(request) == 4:
+                epoch = request[3].lower()
+        return fmt, resume_seq, epoch
 
     async def handle_client(self, reader, writer):
         addr = writer.get_extra_info('peername')
-        self.logger.info(f"Client verbunden: {addr}")
-        self.clients.add(writer)
+        fmt, resume_seq, epoch = await self._negotiate(reader)
+        resume = resume_seq is not None and self.outbox is not None
+        self.logger.info(f"Client verbunden: {addr} (Format: {fmt}"
+                         f"{f', fortsetzen nach {resume_seq}' if resume else ''})")
+
+        # Die Warteschlange wird schon vor dem Nachliefern angemeldet, damit
+        # zwischenzeitlich veröffentlichte Werte nicht verloren gehen
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if not resume:
+            self._enqueue(queue, (self.latest_sample.seq, self._get_payload(fmt)))  # aktueller Stand
+        self.clients[writer] = (queue, fmt)
+
+        tasks = set()
         try:
-            while True:
-                data = await reader.read(100)
-                if not data:
-                    break
-                self.logger.info(f"Empfangen von {addr}: {data}")
-        except Exception as e:
-            self.logger.error(f"Fehler mit Client {addr}: {e}")
+            sent_seq = await self._send_backlog(writer, fmt, resume_seq, epoch, addr) if resume else None
+
+            tasks = {
+                asyncio.create_task(self._send_to_client(writer, queue, sent_seq)),
+                asyncio.create_task(self._read_from_client(reader, addr)),
+            }
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                if task.exception():
+                    self.logger.error(f"Fehler mit Client {addr}: {task.exception()}")
         finally:
+            for task in tasks:
+                task.cancel()
             self.logger.info(f"Client getrennt: {addr}")
-            self.clients.discard(writer)
+            self.clients.pop(writer, None)
             try:
                 writer.close()
                 await writer.wait_closed()
@@ -42,37 +205,25 @@ class ColorSensorServer:
             except Exception as e:
                 self.logger.error(f"Fehler beim Schließen von {addr}: {e}")
 
-    async def send_color_to_clients(self):
-        while True:
-            message = json.dumps({
-                "r": self.latest_color[0],
-                "g": self.latest_color[1],
-                "b": self.latest_color[2]
-            }) + "\n"
-            to_remove = set()
-            for writer in self.clients:
-                try:
-                    writer.write(message.encode())
-                    await writer.drain()
-                except Exception as e:
-                    self.logger.error(f"Fehler beim Senden an Client: {e}")
-                    to_remove.add(writer)
-            for w in to_remove:
-                self.clients.discard(w)
-            await asyncio.sleep(1)
-
     def stop(self):
+        if self._broadcast_task:
+            self._broadcast_task.cancel()
+            self._broadcast_task = None
+
         if self.server:
             self.server.close()
-            self.logger.info("TCP-Server gestoppt")
+            self.logger.info(f"TCP-Server gestoppt ({self.dropped_messages} Nachrichten an langsame Clients verworfen)")
         else:
             self.logger.warning("Server ist nicht gestartet oder bereits gestoppt.")
 
     async def start_server(self):
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
         self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
         self.logger.info(f"Server gestartet auf {self.host}:{self.port}")
 
-        asyncio.create_task(self.send_color_to_clients())
+        self._broadcast_task = asyncio.create_task(self._broadcast_loop())
 
         async with self.server:
             await self.server.serve_forever()
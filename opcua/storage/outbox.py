@@ -0,0 +1,113 @@
+"""
+Dauerhafte Ausgangswarteschlange (Outbox) für die Messwerte des Sensor Servers
+
+Jeder veröffentlichte Messwert wird mit seiner Sequenznummer in einer
+SQLite-Datei (WAL-Modus) abgelegt. Nach einer Verbindungsunterbrechung kann ein
+Client ab seiner zuletzt gespeicherten Sequenznummer fortsetzen und den
+Rückstand in großen Blöcken abholen, statt Lücken in der Statistik zu haben.
+Die Outbox ist auf OUTBOX_MAX_RECORDS Einträge begrenzt, ältere werden gelöscht.
+
+Jede Outbox-Datei erhält beim Anlegen eine zufällige Kennung (Epoche). Wird
+die Datei neu angelegt, beginnen die Sequenznummern wieder bei 1; an der
+geänderten Epoche erkennt ein Client, dass seine gespeicherte Sequenznummer
+nicht mehr gilt.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+
+from config import OUTBOX_BATCH_SIZE, OUTBOX_MAX_RECORDS
+from utils.telemetry import SensorSample
+
+# Alle PRUNE_INTERVAL Einträge werden überzählige alte Einträge gelöscht
+PRUNE_INTERVAL = 100
+
+
+class SampleOutbox:
+    """Speichert SensorSamples dauerhaft und liefert sie ab einer Sequenznummer wieder aus"""
+
+    def __init__(self, path, max_records=OUTBOX_MAX_RECORDS, logger=None):
+        self.path = path
+        self.max_records = max_records
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._appended = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Zugriff aus der asyncio-Schleife und aus dem Thread des OPC UA Servers
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS samples (
+                seq INTEGER PRIMARY KEY,
+                timestamp REAL NOT NULL,
+                temperature REAL,
+                humidity REAL,
+                r INTEGER, g INTEGER, b INTEGER,
+                fan_status INTEGER,
+                fan_duty REAL
+            )
+        """)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+        self._db.commit()
+        self.epoch = self._db.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+        self.logger.info(f"Outbox geöffnet: {path} (Epoche {self.epoch}, "
+                         f"Sequenz {self.first_seq()}..{self.last_seq()})")
+
+    def last_seq(self):
+        """Höchste gespeicherte Sequenznummer (0, wenn die Outbox leer ist)"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM samples").fetchone()[0]
+
+    def first_seq(self):
+        """Älteste noch gespeicherte Sequenznummer (0, wenn die Outbox leer ist)"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MIN(seq), 0) FROM samples").fetchone()[0]
+
+    def append(self, sample):
+        """Speichert einen Messwert unter seiner Sequenznummer"""
+        r, g, b = (int(c) for c in sample.rgb)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (sample.seq, sample.timestamp, sample.temperature, sample.humidity,
+                 r, g, b, int(sample.fan_status), sample.fan_duty)
+            )
+            self._appended += 1
+            if self.max_records and self._appended % PRUNE_INTERVAL == 0:
+                self._db.execute("DELETE FROM samples WHERE seq <= ?", (sample.seq - self.max_records,))
+            self._db.commit()
+
+    def read_after(self, after_seq, limit=OUTBOX_BATCH_SIZE):
+        """
+        Gibt bis zu `limit` Messwerte mit einer Sequenznummer größer als
+        `after_seq` zurück, aufsteigend sortiert. Liegt `after_seq` hinter der
+        letzten Sequenznummer (Outbox neu angelegt), wird von vorne geliefert.
+        """
+        if after_seq > self.last_seq():
+            self.logger.warning(f"Angefragte Sequenz {after_seq} unbekannt - Outbox wird von vorne geliefert")
+            after_seq = 0
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM samples WHERE seq > ? ORDER BY seq LIMIT ?", (after_seq, limit)
+            ).fetchall()
+
+        return [
+            SensorSample(seq=seq, timestamp=timestamp, temperature=temperature, humidity=humidity,
+                         rgb=(r, g, b), fan_status=bool(fan_status), fan_duty=fan_duty)
+            for seq, timestamp, temperature, humidity, r, g, b, fan_status, fan_duty in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
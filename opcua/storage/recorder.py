@@ -0,0 +1,281 @@
+"""
+Binärer Telemetrie-Rekorder für die Messwerte des Sensor Servers
+
+Jeder Messwert wird als Datensatz fester Länge (24 Byte) an eine Segmentdatei
+angehängt. Zum Auswerten werden die Segmente per np.memmap ohne Kopie als
+strukturiertes NumPy-Array eingelesen; Zeitbereiche werden per Binärsuche
+gefunden und können in Zeitintervallen gemittelt werden.
+
+Ein neues Segment beginnt `segment_hours` nach dem ersten Datensatz des
+laufenden Segments und immer dann, wenn die Systemuhr zurückspringt (der Pi
+hat keine RTC und stellt die Uhr erst per NTP). Innerhalb eines Segments sind
+die Zeitstempel damit aufsteigend sortiert.
+
+Aufbau einer Segmentdatei:
+    Kopf (16 Byte): Kennung b"SREC", Version (uint16), Datensatzgröße (uint16),
+                    Startzeit (float64, Unix-Zeit)
+    Datensätze:     Zeitstempel (float64), Temperatur, Feuchte, Lüfter-Duty
+                    (je float32, NaN = ungültig), R, G, B, Flags (je uint8)
+
+    python -m storage.recorder --hours 24 --bucket 3600
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from config import RECORDER_FLUSH_RECORDS, RECORDER_MAX_SEGMENTS, RECORDER_PATH, RECORDER_SEGMENT_HOURS
+from utils.telemetry import FLAG_FAN_ON
+
+SEGMENT_MAGIC = b"SREC"
+SEGMENT_VERSION = 1
+SEGMENT_SUFFIX = ".rec"
+HEADER = struct.Struct("<4sHHd")
+
+RECORD = struct.Struct("<dfffBBBB")
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("temperature", "<f4"),
+    ("humidity", "<f4"),
+    ("fan_duty", "<f4"),
+    ("r", "u1"),
+    ("g", "u1"),
+    ("b", "u1"),
+    ("flags", "u1"),
+])
+
+# Ergebnis von downsample(): Mittelwerte pro Zeitintervall
+DOWNSAMPLED_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("temperature", "<f4"),
+    ("humidity", "<f4"),
+    ("fan_duty", "<f4"),
+    ("r", "<f4"),
+    ("g", "<f4"),
+    ("b", "<f4"),
+    ("fan_on", "<f4"),
+    ("count", "<u4"),
+])
+
+
+def read_segment(path):
+    """
+    Liest eine Segmentdatei ohne Kopie als strukturiertes Array (np.memmap).
+    Ein unvollständiger letzter Datensatz wird ignoriert.
+    """
+    with open(path, "rb") as f:
+        magic, version, record_size, _ = HEADER.unpack(f.read(HEADER.size))
+
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Unbekanntes Segmentformat: {path}")
+
+    count = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+    if count <= 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+
+
+def downsample(records, bucket_seconds):
+    """
+    Mittelt zeitlich sortierte Datensätze über Intervalle von `bucket_seconds`.
+    Ungültige Temperatur-/Feuchtewerte (NaN) werden nicht mitgezählt.
+    """
+    if len(records) == 0:
+        return np.zeros(0, dtype=DOWNSAMPLED_DTYPE)
+
+    buckets = np.floor(records["timestamp"] / bucket_seconds).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(records)])
+
+    result = np.zeros(len(starts), dtype=DOWNSAMPLED_DTYPE)
+    result["timestamp"] = buckets[starts] * bucket_seconds
+    result["count"] = counts
+
+    for field in ("temperature", "humidity"):
+        values = records[field].astype(np.float64)
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        valid_counts = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[field] = sums / valid_counts
+
+    for field in ("fan_duty", "r", "g", "b"):
+        result[field] = np.add.reduceat(records[field].astype(np.float64), starts) / counts
+
+    fan_on = (records["flags"] & FLAG_FAN_ON) != 0
+    result["fan_on"] = np.add.reduceat(fan_on.astype(np.int64), starts) / counts
+    return result
+
+
+class TelemetryRecorder:
+    """Hängt SensorSamples an Segmentdateien an und liest Zeitbereiche wieder ein"""
+
+    def __init__(self, directory=RECORDER_PATH, segment_hours=RECORDER_SEGMENT_HOURS,
+                 max_segments=RECORDER_MAX_SEGMENTS, flush_records=RECORDER_FLUSH_RECORDS, logger=None):
+        self.directory = directory
+        self.segment_seconds = segment_hours * 3600
+        self.max_segments = max_segments
+        self.flush_records = flush_records
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.records_written = 0
+        self._file = None
+        self._segment_start = None
+        self._last_timestamp = None
+        self._unflushed = 0
+        # append() läuft über asyncio.to_thread, query() kann parallel aufgerufen werden
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.logger.info(f"Telemetrie-Rekorder schreibt nach {self.directory}")
+
+    def _segment_path(self, timestamp):
+        """Freier Dateiname aus der Startzeit, bei Namensgleichheit mit Zähler"""
+        base = datetime.datetime.fromtimestamp(timestamp).strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, base + SEGMENT_SUFFIX)
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{base}_{counter}{SEGMENT_SUFFIX}")
+            counter += 1
+        return path
+
+    def _open_segment(self, timestamp):
+        self._close()
+
+        self._file = open(self._segment_path(timestamp), "xb")
+        self._file.write(HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, RECORD.size, timestamp))
+        self._segment_start = timestamp
+        self._remove_old_segments()
+
+    def _remove_old_segments(self):
+        if not self.max_segments:
+            return
+        for path in self.segment_paths()[:-self.max_segments]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"Segment {path} konnte nicht gelöscht werden: {e}")
+
+    def append(self, sample):
+        """Schreibt einen SensorSample als Datensatz"""
+        with self._lock:
+            self._append(sample)
+
+    def _append(self, sample):
+        if self._file is None or sample.timestamp >= self._segment_start + self.segment_seconds:
+            self._open_segment(sample.timestamp)
+        elif sample.timestamp < self._last_timestamp:
+            self.logger.warning(f"Systemuhr um {self._last_timestamp - sample.timestamp:.1f} s zurückgesprungen, "
+                                f"neues Segment wird begonnen")
+            self._open_segment(sample.timestamp)
+        self._last_timestamp = sample.timestamp
+
+        r, g, b = (max(0, min(int(c), 255)) for c in sample.rgb)
+        self._file.write(RECORD.pack(
+            sample.timestamp,
+            float("nan") if sample.temperature is None else sample.temperature,
+            float("nan") if sample.humidity is None else sample.humidity,
+            sample.fan_duty,
+            r, g, b,
+            sample.flags,
+        ))
+        self.records_written += 1
+
+        # Nur alle `flush_records` Datensätze auf die SD-Karte schreiben
+        self._unflushed += 1
+        if self._unflushed >= self.flush_records:
+            self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._file:
+            self._file.flush()
+        self._unflushed = 0
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def segment_paths(self):
+        """Alle Segmentdateien, älteste zuerst"""
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def query(self, start=None, end=None):
+        """
+        Gibt alle Datensätze mit start <= Zeitstempel < end zurück.
+        Liegt der Bereich in einem Segment, ist das Ergebnis eine Sicht auf die
+        gemappte Datei ohne Kopie. Segmente aus der Zeit vor einem Rücksprung der
+        Systemuhr überlappen zeitlich; das Ergebnis wird dann nach Zeit sortiert.
+        """
+        self.flush()
+        parts = []
+
+        for path in self.segment_paths():
+            try:
+                records = read_segment(path)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Segment {path} wird übersprungen: {e}")
+                continue
+
+            if len(records) == 0:
+                continue
+            if end is not None and records["timestamp"][0] >= end:
+                continue
+            if start is not None and records["timestamp"][-1] < start:
+                continue
+
+            timestamps = records["timestamp"]
+            first = 0 if start is None else np.searchsorted(timestamps, start, side="left")
+            last = len(records) if end is None else np.searchsorted(timestamps, end, side="left")
+            if first < last:
+                parts.append(records[first:last])
+
+        if not parts:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+
+        records = np.concatenate(parts)
+        if np.any(np.diff(records["timestamp"]) < 0):
+            records = records[np.argsort(records["timestamp"], kind="stable")]
+        return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auswertung der aufgezeichneten Telemetrie")
+    parser.add_argument("--hours", type=float, default=24.0, help="Zeitraum bis jetzt in Stunden")
+    parser.add_argument("--bucket", type=float, default=3600.0, help="Mittelungsintervall in Sekunden")
+    parser.add_argument("--path", default=RECORDER_PATH, help="Verzeichnis der Segmentdateien")
+    args = parser.parse_args()
+
+    recorder = TelemetryRecorder(args.path, logger=logging.getLogger("recorder"))
+    records = recorder.query(start=time.time() - args.hours * 3600)
+    print(f"{len(records)} Datensätze")
+
+    print(f"{'Zeit':<20}{'Temp °C':>9}{'Feuchte %':>11}{'R':>6}{'G':>6}{'B':>6}{'Lüfter':>8}{'Anzahl':>8}")
+    for row in downsample(records, args.bucket):
+        moment = datetime.datetime.fromtimestamp(row["timestamp"]).strftime("%Y-%m-%d %H:%M")
+        print(f"{moment:<20}{row['temperature']:>9.1f}{row['humidity']:>11.1f}{row['r']:>6.0f}"
+              f"{row['g']:>6.0f}{row['b']:>6.0f}{row['fan_on']:>8.0%}{row['count']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,160 @@
 """
 Logging Utilities für den Raspberry Pi Sensor Server
+
+Log-Einträge werden nur in eine begrenzte Queue gestellt; ein Listener-Thread
+schreibt sie in die Datei und auf die Konsole. Ist die Queue voll, wird der
+Eintrag verworfen und gezählt, statt den aufrufenden Thread (z.B. die
+asyncio-Schleife) zu blockieren. Die Log-Datei wird nach Größe und Alter
+rotiert, komprimiert wird in einem eigenen Hintergrund-Thread.
 """
 
 import datetime
 import logging
+import logging.handlers
 import os
+import queue
 import tarfile
+import threading
+import time
+
+from config import (LOG_ARCHIVE_COUNT, LOG_DIR, LOG_FILE, LOG_FORMAT, LOG_LEVEL, LOG_MAX_BYTES,
+                    LOG_QUEUE_SIZE, LOG_ROTATE_HOURS)
+
+_listener = None
+_queue_handler = None
+_compressor = None
+
+# Sekunden, die beim Beenden auf Platz für das Stoppsignal in der Log-Queue gewartet wird
+SENTINEL_TIMEOUT = 5.0
+
+
+def _next_archive_path():
+    """Freier Archivname mit Datumsbezeichnung und aufsteigendem Zähler"""
+    today_str = datetime.datetime.now().strftime("%Y%m%d")
+    counter = 1
+    while True:
+        archive_path = os.path.join(LOG_DIR, f"{today_str}-{counter}.tar.gz")
+        if not os.path.exists(archive_path):
+            return archive_path
+        counter += 1
+
+
+def _remove_old_archives():
+    """Löscht die ältesten Archive, wenn mehr als LOG_ARCHIVE_COUNT vorhanden sind"""
+    if not LOG_ARCHIVE_COUNT:
+        return
+
+    archives = sorted(
+        (os.path.join(LOG_DIR, name) for name in os.listdir(LOG_DIR) if name.endswith(".tar.gz")),
+        key=os.path.getmtime
+    )
+    for path in archives[:-LOG_ARCHIVE_COUNT]:
+        os.remove(path)
+
+
+class LogCompressor:
+    """Komprimiert rotierte Log-Dateien in einem Hintergrund-Thread"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="LogCompressor", daemon=True)
+        self._thread.start()
+
+    def submit(self, path):
+        self._queue.put(path)
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                break
+
+            try:
+                with tarfile.open(_next_archive_path(), "w:gz") as tar:
+                    tar.add(path, arcname=LOG_FILE)
+                os.remove(path)
+                _remove_old_archives()
+            except Exception as e:
+                # Der Logger selbst ist hier nicht verwendbar (Rekursion)
+                print(f"Fehler beim Komprimieren von {path}: {e}")
+
+    def stop(self, timeout=30):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class RotatingCompressedFileHandler(logging.FileHandler):
+    """
+    Schreibt in LOG_FILE und rotiert, sobald die Datei `max_bytes` groß oder
+    älter als `rotate_seconds` ist. Die Datei wird nur umbenannt, das
+    Komprimieren übernimmt der LogCompressor.
+    """
+
+    def __init__(self, filename, compressor, max_bytes=LOG_MAX_BYTES, rotate_seconds=LOG_ROTATE_HOURS * 3600):
+        super().__init__(filename, encoding="utf-8")
+        self.compressor = compressor
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self._rollover_at = time.time() + rotate_seconds if rotate_seconds else None
+
+    def _should_rollover(self):
+        if self.max_bytes and self.stream and self.stream.tell() >= self.max_bytes:
+            return True
+        return self._rollover_at is not None and time.time() >= self._rollover_at
+
+    def emit(self, record):
+        super().emit(record)
+        try:
+            if self._should_rollover():
+                self.rollover()
+        except Exception:
+            self.handleError(record)
+
+    def rollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
 
-from config import LOG_DIR, LOG_FILE, LOG_FORMAT, LOG_LEVEL
+        rotated_path = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+        if os.path.exists(self.baseFilename):
+            os.replace(self.baseFilename, rotated_path)
+            self.compressor.submit(rotated_path)
+
+        if self.rotate_seconds:
+            self._rollover_at = time.time() + self.rotate_seconds
+        self.stream = self._open()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, der bei voller Queue den Eintrag verwirft und mitzählt"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener, der sein Stoppsignal auch bei voller Queue einreiht.
+    Die Basisklasse verwendet put_nowait und würde dann mit queue.Full
+    abbrechen; der Listener-Thread leert die Queue aber weiter, also wird
+    kurz auf einen freien Platz gewartet.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=SENTINEL_TIMEOUT)
 
 
 def rotate_latest_log():
     """
-    Prüft, ob logs/latest.log existiert und archiviert sie
-    in ein .tar.gz Archiv mit Datumsbezeichnung und aufsteigendem Zähler.
+    Prüft, ob logs/latest.log vom letzten Lauf existiert und übergibt sie
+    dem Hintergrund-Thread zur Archivierung.
     """
     latest_log_path = os.path.join(LOG_DIR, LOG_FILE)
     os.makedirs(LOG_DIR, exist_ok=True)
@@ -21,37 +162,70 @@ def rotate_latest_log():
     if not os.path.isfile(latest_log_path):
         return
 
-    today_str = datetime.datetime.now().strftime("%Y%m%d")
-    counter = 1
-
-    while True:
-        archive_name = f"{today_str}-{counter}.tar.gz"
-        archive_path = os.path.join(LOG_DIR, archive_name)
-
-        if not os.path.exists(archive_path):
-            with tarfile.open(archive_path, "w:gz") as tar:
-                tar.add(latest_log_path, arcname=LOG_FILE)
-            os.remove(latest_log_path)
-            break
-        counter += 1
+    rotated_path = f"{latest_log_path}.{time.strftime('%Y%m%d-%H%M%S')}"
+    os.replace(latest_log_path, rotated_path)
+    _compressor.submit(rotated_path)
 
 
 def setup_logging(name="RaspberryPi :: Server"):
     """
     Konfiguriert das Logging-System
     """
-    rotate_latest_log()
+    global _listener, _queue_handler, _compressor
 
-    # Logging Level aus String konvertieren
-    numeric_level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
+    if _listener is None:
+        _compressor = LogCompressor()
+        rotate_latest_log()
 
-    logging.basicConfig(
-        level=numeric_level,
-        format=LOG_FORMAT,
-        handlers=[
-            logging.FileHandler(os.path.join(LOG_DIR, LOG_FILE)),
-            logging.StreamHandler()
-        ]
-    )
+        # Logging Level aus String konvertieren
+        numeric_level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
+        formatter = logging.Formatter(LOG_FORMAT)
+
+        file_handler = RotatingCompressedFileHandler(os.path.join(LOG_DIR, LOG_FILE), _compressor)
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _listener = DrainingQueueListener(_queue_handler.queue, file_handler, stream_handler)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.setLevel(numeric_level)
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
 
     return logging.getLogger(name)
+
+
+def get_dropped_count():
+    """Anzahl der verworfenen Log-Einträge (Queue voll)"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def shutdown_logging():
+    """Schreibt alle ausstehenden Einträge und wartet auf laufende Komprimierungen"""
+    global _listener, _queue_handler, _compressor
+
+    if _listener is None:
+        return
+
+    dropped = get_dropped_count()
+    if dropped:
+        logging.getLogger(__name__).warning(f"{dropped} Log-Einträge wurden verworfen (Queue voll)")
+
+    logging.getLogger().removeHandler(_queue_handler)
+    try:
+        _listener.stop()
+    except queue.Full:
+        # Listener-Thread hängt; Handler und Komprimierung trotzdem beenden
+        print(f"Log-Queue nach {SENTINEL_TIMEOUT} s noch voll, ausstehende Einträge gehen verloren")
+    finally:
+        for handler in _listener.handlers:
+            handler.close()
+        _compressor.stop()
+
+    _listener = None
+    _queue_handler = None
+    _compressor = None
@@ -0,0 +1,92 @@
+"""
+Telemetrie-Datensatz des Sensor Servers und seine Kodierungen
+"""
+
+import json
+import struct
+import time
+
+FLAG_FAN_ON = 0x01
+FLAG_TEMPERATURE_VALID = 0x02
+FLAG_HUMIDITY_VALID = 0x04
+
+# Binärer Datensatz (Little-Endian, 28 Byte):
+# Sequenznummer (uint32), Zeitstempel (float64, Unix-Zeit), Temperatur, Feuchte,
+# Lüfter-Duty (je float32), R, G, B, Flags (je uint8)
+BINARY_RECORD = struct.Struct("<IdfffBBBB")
+
+
+class SensorSample:
+    """
+    Ein vollständiger Messwert-Datensatz, wie ihn der SensorServer erfasst
+    """
+
+    __slots__ = ("seq", "timestamp", "temperature", "humidity", "rgb", "fan_status", "fan_duty")
+
+    def __init__(self, seq=0, timestamp=None, temperature=None, humidity=None, rgb=(0, 0, 0),
+                 fan_status=False, fan_duty=0.0):
+        self.seq = seq
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.temperature = temperature
+        self.humidity = humidity
+        self.rgb = tuple(rgb)
+        self.fan_status = bool(fan_status)
+        self.fan_duty = float(fan_duty or 0.0)
+
+    @property
+    def flags(self):
+        flags = 0
+        if self.fan_status:
+            flags |= FLAG_FAN_ON
+        if self.temperature is not None:
+            flags |= FLAG_TEMPERATURE_VALID
+        if self.humidity is not None:
+            flags |= FLAG_HUMIDITY_VALID
+        return flags
+
+    def to_dict(self):
+        r, g, b = self.rgb
+        return {
+            "seq": self.seq,
+            "timestamp": self.timestamp,
+            "temperature": self.temperature,
+            "humidity": self.humidity,
+            "color": [r, g, b],
+            # Einzelne Kanäle für ältere Clients, die nur {"r","g","b"} kennen
+            "r": r,
+            "g": g,
+            "b": b,
+            "fan_status": self.fan_status,
+            "fan_duty": self.fan_duty,
+        }
+
+    def to_json_line(self):
+        """Kodiert den Datensatz als eine JSON-Zeile"""
+        return (json.dumps(self.to_dict()) + "\n").encode()
+
+    def to_binary(self):
+        """Kodiert den Datensatz als binären Datensatz fester Länge"""
+        r, g, b = (max(0, min(int(c), 255)) for c in self.rgb)
+        return BINARY_RECORD.pack(
+            self.seq & 0xFFFFFFFF,
+            self.timestamp,
+            float("nan") if self.temperature is None else self.temperature,
+            float("nan") if self.humidity is None else self.humidity,
+            self.fan_duty,
+            r, g, b,
+            self.flags,
+        )
+
+    @classmethod
+    def from_binary(cls, data):
+        """Dekodiert einen binären Datensatz"""
+        seq, timestamp, temperature, humidity, fan_duty, r, g, b, flags = BINARY_RECORD.unpack(data)
+        return cls(
+            seq=seq,
+            timestamp=timestamp,
+            temperature=temperature if flags & FLAG_TEMPERATURE_VALID else None,
+            humidity=humidity if flags & FLAG_HUMIDITY_VALID else None,
+            rgb=(r, g, b),
+            fan_status=bool(flags & FLAG_FAN_ON),
+            fan_duty=fan_duty,
+        )